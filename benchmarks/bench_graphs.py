@@ -0,0 +1,226 @@
+"""
+Benchmarks of ds_toolbox.graphs plotting functions on synthetic data.
+
+For each function, number of rows and number of keys, records:
+- wall time (best of --repeat runs)
+- peak memory allocated during the call (measured with tracemalloc in a separate run)
+- size of the serialized figure JSON (what is sent to the browser)
+
+'*_fast' cases build the same figures as their validated counterparts with the fast=True kwarg of
+ds_toolbox.graphs.plot, so that the speedup of skipping plotly validation can be read from the results (most visible
+with many keys).
+
+Default sizes and --max-points keep a full run within minutes. Cases building per-row python hover texts are skipped
+above CASES_MAX_POINTS values (rows * keys), even when larger sizes are given.
+
+Usage:
+    python -m benchmarks.bench_graphs
+    python -m benchmarks.bench_graphs --sizes 1e3 1e5 1e7 --keys 1 8 --functions plot_evolution plot_hist
+    python -m benchmarks.bench_graphs --sizes 1e7 --max-points 0
+    python -m benchmarks.bench_graphs --output bench_output.json
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from ds_toolbox import graphs
+
+DEFAULT_SIZES = [1e3, 1e4, 1e5, 1e6]
+DEFAULT_KEYS = [1, 4]
+DEFAULT_MAX_POINTS = 1e6
+
+
+def make_df(n_rows, n_keys, seed=0):
+    """
+    Builds a synthetic pandas DataFrame of random walks indexed by dates, with a few spikes and missing values.
+
+    :param n_rows: number of rows
+    :type n_rows: int
+
+    :param n_keys: number of columns, named 'key_0', 'key_1', ...
+    :type n_keys: int
+
+    :param seed: random generator seed
+    :type seed: int, optional
+
+    :return: pandas DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.standard_normal((n_rows, n_keys)).cumsum(axis=0)
+    spikes = rng.integers(0, n_rows, size=max(n_rows // 10000, 1))
+    values[spikes] += 50.
+    values[rng.integers(0, n_rows, size=n_rows // 100)] = np.nan
+    return pd.DataFrame(
+        values,
+        columns=['key_{}'.format(ind) for ind in range(n_keys)],
+        index=pd.date_range('2020-01-01', periods=n_rows, freq='s')
+    )
+
+
+@contextmanager
+def capture_figures():
+    """
+    Captures figures built by ds_toolbox.graphs.plot, plotting functions only returning their DataFrame.
+    """
+    figures = []
+    original_plot = graphs.plot
+
+    def capturing_plot(*args, **kwargs):
+        figure = original_plot(*args, **kwargs)
+        figures.append(figure)
+        return figure
+
+    graphs.plot = capturing_plot
+    try:
+        yield figures
+    finally:
+        graphs.plot = original_plot
+
+
+def bandwith_figure(df, keys, **kwargs):
+    """
+    Builds a figure of horizontal bands: a constant one and an array-valued one per key.
+    """
+    import plotly.graph_objects as go
+
+    traces = graphs.add_horizontal_bandwith(dict_bandwith={'up_value': 1., 'down_value': -1.}, x_values=df.index)
+    for key in keys:
+        traces += graphs.add_horizontal_bandwith(
+            dict_bandwith={'up_value': df[key].values + 1., 'down_value': df[key].values - 1.},
+            x_values=df.index
+        )
+    return go.Figure(traces)
+
+
+# name: function(df, keys) building the figure, plotting functions figure being captured
+CASES = {
+    'plot_evolution': lambda df, keys, **kwargs: graphs.plot_evolution(keys, df, show=False, **kwargs),
+    'plot_evolution_fast': lambda df, keys, **kwargs: graphs.plot_evolution(keys, df, show=False, fast=True, **kwargs),
+    'plot_evolution_epoch': lambda df, keys, **kwargs: graphs.plot_evolution(
+        keys, df, show=False, date_encoding='epoch', **kwargs),
+    'plot_evolution_downsampled': lambda df, keys, **kwargs: graphs.plot_evolution(
+        keys, df, show=False, target_number_points=2000, downsample='minmax', **kwargs),
+    'plot_facets': lambda df, keys, **kwargs: graphs.plot_facets(keys, df, show=False, **kwargs),
+    'plot_hist': lambda df, keys, **kwargs: graphs.plot_hist(keys, df, quantiles=[0.05, 0.5, 0.95], show=False,
+                                                             **kwargs),
+    'plot_hist_kde': lambda df, keys, **kwargs: graphs.plot_hist(keys, df, show=False, kernel_density='gaussian',
+                                                                 **kwargs),
+    'plot_xy': lambda df, keys, **kwargs: graphs.plot_xy(df, keys[0], keys, show=False, **kwargs),
+    'plot_xy_template': lambda df, keys, **kwargs: graphs.plot_xy(df, keys[0], keys, show=False, hover='template',
+                                                                   **kwargs),
+    'plot_xy_fast': lambda df, keys, **kwargs: graphs.plot_xy(df, keys[0], keys, show=False, hover='template',
+                                                               fast=True, **kwargs),
+    'add_horizontal_bandwith': bandwith_figure,
+}
+
+# name: maximal number of values (rows * keys) of cases whose cost is dominated by per-row python work (ex: text
+# hover of plot_xy, about 10 s for 1e5 values)
+CASES_MAX_POINTS = {
+    'plot_xy': 1e5,
+}
+
+
+def run_case(function, df, keys, repeat=3, **kwargs):
+    """
+    Benchmarks one case.
+
+    :return: dict with 'seconds', 'peak_memory_mb' and 'json_mb' keys
+    """
+    durations = []
+    for _ in range(repeat):
+        # Each run must choose between SVG and WebGL traces as if it was the first figure of the notebook
+        graphs.reset_webgl_contexts()
+        with capture_figures() as figures:
+            start = time.perf_counter()
+            result = function(df, keys, **kwargs)
+            durations.append(time.perf_counter() - start)
+
+    graphs.reset_webgl_contexts()
+    tracemalloc.start()
+    with capture_figures():
+        function(df, keys, **kwargs)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    figure = figures[-1] if figures else result
+    return {
+        'seconds': min(durations),
+        'peak_memory_mb': peak_memory / 1e6,
+        'json_mb': len(figure.to_json()) / 1e6,
+    }
+
+
+def run_benchmarks(functions, sizes, keys_counts, repeat=3, max_points=None, **kwargs):
+    """
+    Runs benchmarks of all combinations of functions, sizes and keys counts, printing results as they come.
+
+    :param functions: list of CASES names
+    :type functions: list
+
+    :param sizes: list of numbers of rows
+    :type sizes: list
+
+    :param keys_counts: list of numbers of keys
+    :type keys_counts: list
+
+    :param repeat: number of timed runs of each case
+    :type repeat: int, optional
+
+    :param max_points: cases with more than max_points values (rows * keys) are skipped
+    :type max_points: int, optional
+
+    :param kwargs: optional arguments given to all plotting functions
+
+    :return: list of results dicts
+    """
+    results = []
+    print('{:<28} {:>10} {:>5} {:>10} {:>12} {:>10}'.format(
+        'function', 'rows', 'keys', 'seconds', 'peak MB', 'JSON MB'
+    ))
+    for n_rows in sizes:
+        for n_keys in keys_counts:
+            if max_points is not None and n_rows * n_keys > max_points:
+                continue
+            df = make_df(int(n_rows), n_keys)
+            keys = list(df.columns)
+            for name in functions:
+                if n_rows * n_keys > CASES_MAX_POINTS.get(name, np.inf):
+                    continue
+                result = dict(function=name, rows=int(n_rows), keys=n_keys, **run_case(
+                    CASES[name], df, keys, repeat=repeat, **kwargs
+                ))
+                print('{function:<28} {rows:>10} {keys:>5} {seconds:>10.3f} {peak_memory_mb:>12.1f} '
+                      '{json_mb:>10.2f}'.format(**result))
+                sys.stdout.flush()
+                results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--functions', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=float, default=DEFAULT_SIZES)
+    parser.add_argument('--keys', nargs='+', type=int, default=DEFAULT_KEYS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-points', type=float, default=DEFAULT_MAX_POINTS,
+                        help='skip cases with more than max-points values (rows * keys), 0 for no limit')
+    parser.add_argument('--output', default=None, help='JSON file where results are written')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.functions, args.sizes, args.keys, repeat=args.repeat, max_points=args.max_points or None
+    )
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
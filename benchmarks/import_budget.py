@@ -0,0 +1,80 @@
+"""
+Checks that importing ds_toolbox modules stays cheap: heavy dependencies must not be imported eagerly, and both the
+import time and the number of imported modules must stay under budget.
+
+Usage: python -m benchmarks.import_budget
+Exits with a non zero status code when a budget is exceeded.
+"""
+import json
+import subprocess
+import sys
+
+# Modules which must only be imported when a function using them is called
+FORBIDDEN_MODULES = ['numpy', 'pandas', 'plotly', 'matplotlib', 'sklearn', 'scipy', 'xarray', 'dask', 'pyarrow',
+                     'kaleido']
+
+BUDGETS = {
+    # module name: (maximal cumulated import time in ms, maximal number of newly imported modules)
+    'ds_toolbox': (50, 20),
+    'ds_toolbox.graphs': (150, 80),
+}
+
+_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+duration = (time.perf_counter() - start) * 1000
+print(json.dumps({{'duration': duration, 'modules': sorted(set(sys.modules) - before)}}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """
+    Imports a module in fresh python interpreters.
+
+    :param module: name of the module to import
+    :type module: str
+
+    :param repeat: number of interpreters to launch, the fastest import being kept
+    :type repeat: int, optional
+
+    :return: tuple (import duration in ms, list of newly imported modules names)
+    """
+    results = [
+        json.loads(subprocess.check_output([sys.executable, '-c', _PROBE.format(module=module)]))
+        for _ in range(repeat)
+    ]
+    fastest = min(results, key=lambda result: result['duration'])
+    return fastest['duration'], fastest['modules']
+
+
+def check_import_budgets(budgets=None):
+    """
+    Checks import budgets of ds_toolbox modules.
+
+    :param budgets: dict of module name: (maximal import time in ms, maximal number of newly imported modules).
+    Defaults to BUDGETS
+    :type budgets: dict, optional
+
+    :return: list of error messages, empty if all budgets are respected
+    """
+    errors = []
+    for module, (max_duration, max_modules) in (budgets or BUDGETS).items():
+        duration, modules = measure_import(module)
+        print('{}: {:.1f} ms, {} modules imported'.format(module, duration, len(modules)))
+        eager = sorted({name.split('.')[0] for name in modules} & set(FORBIDDEN_MODULES))
+        if eager:
+            errors.append('{} eagerly imports {}'.format(module, ', '.join(eager)))
+        if duration > max_duration:
+            errors.append('{} import takes {:.1f} ms (budget: {} ms)'.format(module, duration, max_duration))
+        if len(modules) > max_modules:
+            errors.append('{} imports {} modules (budget: {})'.format(module, len(modules), max_modules))
+    return errors
+
+
+if __name__ == '__main__':
+    budget_errors = check_import_budgets()
+    for error in budget_errors:
+        print('ERROR: ' + error)
+    sys.exit(1 if budget_errors else 0)
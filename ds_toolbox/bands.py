@@ -0,0 +1,63 @@
+import logging
+
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def is_envelope(band):
+    """
+    Checks whether a bandwith dict describes an envelope computed from a key (see envelope_band) rather than
+    precomputed up_value and down_value.
+
+    :param band: bandwith dict
+    :type band: dict
+
+    :return: bool
+    """
+    return 'key' in band
+
+
+def envelope_band(series, rolling=None, ewm=None, k=2., min_periods=1):
+    """
+    Computes the envelope band of a series: its moving mean plus and minus k moving standard deviations, with either a
+    rolling window or an exponentially weighted window. Both are computed in one O(n) pass by pandas window
+    aggregations (online updates of the window mean and variance), without materializing the windows.
+
+    :param series: pandas Series of float values indexed by dates or numbers, sorted by index
+    :type series: pandas Series
+
+    :param rolling: rolling window: number of rows, or time offset with a dates index (ex: '1h')
+    :type rolling: int or str, optional
+
+    :param ewm: exponentially weighted window: span in number of rows, or half-life time offset with a dates index
+    (ex: '10min')
+    :type ewm: float or str, optional
+
+    :param k: number of standard deviations between the moving mean and the bounds of the band
+    :type k: float, optional
+
+    :param min_periods: minimal number of valid values in a window for the band to be defined (NaN otherwise)
+    :type min_periods: int, optional
+
+    :return: dict with 'up_value' and 'down_value' numpy arrays of len(series) values (see add_horizontal_bandwith)
+    """
+    if (rolling is None) == (ewm is None):
+        raise ValueError('Exactly one of rolling and ewm windows must be given')
+    series = series.astype(float)
+    if rolling is not None:
+        window = series.rolling(rolling, min_periods=min_periods)
+        mean, std = window.mean().to_numpy(), window.std().to_numpy()
+    else:
+        # Exponentially weighted variance is computed from the moving means of the centered values and of their squares,
+        # which pandas also supports for time half-lives
+        centered = series - series.mean()
+        options = dict(halflife=ewm, times=series.index) if isinstance(ewm, str) else dict(span=ewm)
+        moments = pd.DataFrame({'value': centered, 'square': centered ** 2}).ewm(min_periods=min_periods, **options)
+        moments = moments.mean()
+        variance = np.maximum(moments['square'].to_numpy() - moments['value'].to_numpy() ** 2, 0.)
+        mean, std = moments['value'].to_numpy() + series.mean(), np.sqrt(variance)
+    return dict(up_value=mean + k * std, down_value=mean - k * std)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+
+from ds_toolbox.lazy import lazy_import
+
+go = lazy_import('plotly.graph_objects')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def _array_digest(values):
+    """
+    Hashes an array-like of values (numpy array, pandas Series or Index, list...) with its index if any.
+    """
+    if not isinstance(values, (pd.Series, pd.Index)):
+        values = pd.Series(np.asarray(values))
+    return hashlib.blake2b(
+        pd.util.hash_pandas_object(values, index=isinstance(values, pd.Series)).to_numpy().tobytes(), digest_size=16
+    ).hexdigest()
+
+
+def _json_default(value):
+    """
+    Converts plotting kwargs values which are not JSON serializable to stable strings (arrays to their digest, plotly
+    traces to their properties).
+    """
+    if hasattr(value, 'to_plotly_json'):
+        return value.to_plotly_json()
+    if isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+        return 'array:' + _array_digest(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def _to_arrays(value):
+    """
+    Converts lists of scalars and base64 encoded typed arrays ({'dtype', 'bdata', 'shape'} dicts written by plotly
+    >= 6) of a loaded figure JSON to numpy arrays, which plotly copies at once when building the figure instead of
+    copying each element. Mixed lists (ex: colorscales) are kept as lists.
+    """
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            import base64
+
+            array = np.frombuffer(bytearray(base64.b64decode(value['bdata'])), dtype=value['dtype'])
+            if 'shape' in value:
+                array = array.reshape([int(size) for size in str(value['shape']).split(',')])
+            return array
+        return {name: _to_arrays(item) for name, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > 0 and isinstance(value[0], (str, int, float)):
+            array = np.asarray(value)
+            if array.dtype.kind in 'biuf' or (
+                array.dtype.kind == 'U' and all(isinstance(item, str) for item in value)
+            ):
+                return array
+        return [_to_arrays(item) for item in value]
+    return value
+
+
+def figure_key(name, df, options):
+    """
+    Computes the content address of a figure: a blake2b digest of the plotted DataFrame (index, columns names and
+    values, hashed with pandas.util.hash_pandas_object) and of the plotting options.
+
+    :param name: name of the plotting function (ex: 'plot_evolution')
+    :type name: str
+
+    :param df: pandas DataFrame of plotted columns
+    :type df: pandas DataFrame
+
+    :param options: plotting arguments and kwargs. Values which are not JSON serializable are hashed (arrays) or
+    represented with repr
+    :type options: dict
+
+    :return: hexadecimal key string
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(name.encode('utf-8'))
+    hasher.update(json.dumps([str(column) for column in df.columns]).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    hasher.update(json.dumps(options, sort_keys=True, default=_json_default).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class FigureCache:
+    """
+    On-disk cache of built figures, addressed by the content of plotted data and plotting options (see figure_key).
+    Figures are stored as plotly JSON files (one per key) and loaded back without plotly validation, so that a warm
+    load only costs reading and parsing the JSON. Least recently used files are removed when the total size of the
+    cache exceeds max_bytes.
+    Figures are written atomically, so that a cache directory can be shared by several processes (ex: voila kernels).
+
+    :param directory: directory where figures JSON files are stored, created if needed
+    :type directory: str
+
+    :param max_bytes: maximal total size of stored figures in bytes
+    :type max_bytes: int, optional
+    """
+
+    def __init__(self, directory, max_bytes=512 * 2 ** 20):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        """
+        :return: path of the JSON file of key figure
+        """
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """
+        Loads a cached figure and marks it as recently used.
+
+        :param key: figure key (see figure_key)
+        :type key: str
+
+        :return: plotly figure object, None if key is not cached
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'r') as figure_file:
+                figure_json = json.load(figure_file)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted by another process or partially written by an older version
+            return None
+        return go.Figure(
+            data=_to_arrays(figure_json.get('data', [])),
+            layout=figure_json.get('layout', {}),
+            frames=figure_json.get('frames', []),
+            _validate=False
+        )
+
+    def put(self, key, figure):
+        """
+        Stores a figure and evicts least recently used figures if the cache is over max_bytes.
+
+        :param key: figure key (see figure_key)
+        :type key: str
+
+        :param figure: plotly figure object
+        :type figure: plotly.graph_objects.Figure
+        """
+        import tempfile
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as figure_file:
+                figure_file.write(figure.to_json())
+            os.replace(temporary_path, self.path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        :return: list of (modification time, size in bytes, path) tuples of stored figures, least recently used first
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self):
+        """
+        :return: total size of stored figures in bytes
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Removes least recently used figures until total size is under max_bytes.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.debug('Evicted cached figure %s (%s bytes)', path, size)
+
+    def clear(self):
+        """
+        Removes all stored figures.
+        """
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def get_cache(cache):
+    """
+    :param cache: FigureCache or directory path of a FigureCache
+    :type cache: FigureCache or str
+
+    :return: FigureCache
+    """
+    return cache if isinstance(cache, FigureCache) else FigureCache(cache)
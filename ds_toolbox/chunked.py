@@ -0,0 +1,139 @@
+import logging
+from math import ceil
+
+from ds_toolbox.downsampling import bucket_aggregate
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+REDUCTIONS = ['minmax', 'mean']
+
+
+def is_xarray(data):
+    """
+    Checks whether data is an xarray DataArray or Dataset (possibly backed by dask arrays).
+
+    :param data: plotting functions input data
+    :type data: object
+
+    :return: bool
+    """
+    return type(data).__module__.startswith('xarray')
+
+
+def _reduce_block(block, offset, bucket_size):
+    """
+    Computes bucket statistics of one chunk of rows starting at offset global position, minimal and maximal rows being
+    given by their global positions.
+    """
+    block = np.asarray(block, dtype=float)
+    aggregate = bucket_aggregate(block, (offset + np.arange(len(block))) // bucket_size)
+    for name in ['argmin', 'argmax']:
+        aggregate[name] = offset + aggregate[name]
+    return aggregate
+
+
+def merge_aggregates(aggregates, n_buckets):
+    """
+    Merges bucket statistics computed on several chunks of the same series (see
+    ds_toolbox.downsampling.bucket_aggregate), a bucket being possibly split over two chunks.
+
+    :param aggregates: list of statistics dicts of chunks, 'argmin' and 'argmax' being global positions of rows
+    :type aggregates: list
+
+    :param n_buckets: total number of buckets
+    :type n_buckets: int
+
+    :return: statistics dict whose arrays have n_buckets rows
+    """
+    parts = {name: np.concatenate([aggregate[name] for aggregate in aggregates]) for name in aggregates[0]}
+    n_series = parts['count'].shape[1]
+    merged = {}
+    for name in ['count', 'sum']:
+        merged[name] = np.zeros((n_buckets, n_series))
+        np.add.at(merged[name], parts['bucket'], parts[name])
+
+    for name, sign in [('min', 1.), ('max', -1.)]:
+        merged[name] = np.full((n_buckets, n_series), np.nan)
+        merged['arg' + name] = np.zeros((n_buckets, n_series), dtype=int)
+        for column in range(n_series):
+            # Best extreme of each bucket comes first, NaN (empty parts) being sorted last
+            order = np.lexsort((np.nan_to_num(sign * parts[name][:, column], nan=np.inf), parts['bucket']))
+            first = order[np.r_[True, parts['bucket'][order][1:] != parts['bucket'][order][:-1]]]
+            buckets = parts['bucket'][first]
+            merged[name][buckets, column] = parts[name][first, column]
+            merged['arg' + name][buckets, column] = parts['arg' + name][first, column]
+    return merged
+
+
+def reduce_xarray(data, keys, n_out=1000, method='minmax'):
+    """
+    Reduces an xarray Dataset or DataArray along its dimension to about n_out points per key, without loading it in
+    memory. Rows are split into buckets (about one per horizontal pixel) whose statistics are computed chunk by chunk,
+    in parallel with dask when data is dask-backed, and merged with numpy. Only the reduced points are materialized:
+    with 'minmax', rows holding extremes of any key are read once at the end, so that all keys values are real values
+    of these rows.
+
+    :param data: xarray Dataset whose keys variables share a single dimension, or 1-D DataArray
+    :type data: xarray.Dataset or xarray.DataArray
+
+    :param keys: list of variables names. A DataArray is plotted with the first key as name
+    :type keys: list
+
+    :param n_out: target number of points per key
+    :type n_out: int, optional
+
+    :param method: reduction algorithm. Possible choices are 'minmax' (minimal and maximal points of each bucket, at
+    their own x, n_out / 2 buckets) and 'mean' (mean value of each bucket, at bucket first x, n_out buckets)
+    :type method: str, optional
+
+    :return: pandas DataFrame of reduced points indexed by the dimension coordinate (or positions)
+    """
+    if method not in REDUCTIONS:
+        raise ValueError("Unknown xarray reduction '{}'. Possible choices are : {}".format(
+            method, ', '.join(REDUCTIONS)
+        ))
+    if not hasattr(data, 'data_vars'):
+        data = data.to_dataset(name=keys[0])
+    variables = [data[key] for key in keys]
+    dimension = variables[0].dims[0]
+    if any(variable.dims != (dimension,) for variable in variables):
+        raise ValueError('keys variables must all be 1-D along {} dimension'.format(dimension))
+    x = data[dimension].to_index() if dimension in data.coords else pd.RangeIndex(data.sizes[dimension])
+
+    n = len(x)
+    n_buckets = max(n_out // 2, 1) if method == 'minmax' else max(n_out, 1)
+    bucket_size = max(ceil(n / n_buckets), 1)
+    n_buckets = ceil(n / bucket_size)
+
+    if any(hasattr(variable.data, 'dask') for variable in variables):
+        import dask
+        import dask.array as da
+
+        stacked = da.stack([da.asarray(variable.data) for variable in variables], axis=1).rechunk({1: -1})
+        offsets = np.r_[0, np.cumsum(stacked.chunks[0])[:-1]]
+        tasks = [
+            dask.delayed(_reduce_block)(block, offset, bucket_size)
+            for block, offset in zip(stacked.to_delayed()[:, 0], offsets)
+        ]
+        logger.debug('Reducing %s rows of %s keys in %s chunks to %s buckets', n, len(keys), len(tasks), n_buckets)
+        aggregates = list(dask.compute(*tasks))
+    else:
+        stacked = np.column_stack([variable.values for variable in variables])
+        aggregates = [_reduce_block(stacked, 0, bucket_size)]
+    merged = merge_aggregates(aggregates, n_buckets)
+
+    if method == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = merged['sum'] / merged['count']
+        return pd.DataFrame(means, index=x[np.arange(n_buckets) * bucket_size], columns=keys)
+
+    positions = np.unique(np.concatenate([merged['argmin'].ravel(), merged['argmax'].ravel()]))
+    rows = stacked[positions]
+    if hasattr(rows, 'compute'):
+        logger.debug('Reading %s extreme rows of %s keys', len(positions), len(keys))
+        rows = rows.compute()
+    return pd.DataFrame(np.asarray(rows, dtype=float), index=x[positions], columns=keys)
@@ -0,0 +1,142 @@
+import logging
+from math import ceil
+
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+
+# Kernel profiles as functions of distance / bandwidth, associated with their support (in bandwidths) beyond which they
+# are considered null. Names and bandwidth conventions are the ones of sklearn.neighbors.KernelDensity.
+KERNELS = {
+    'gaussian': (lambda u: np.exp(-0.5 * u ** 2), 4.),
+    'epanechnikov': (lambda u: np.clip(1. - u ** 2, 0., None), 1.),
+    'tophat': (lambda u: (u < 1.).astype(float), 1.),
+    'linear': (lambda u: np.clip(1. - u, 0., None), 1.),
+    'exponential': (lambda u: np.exp(-u), 10.),
+    'cosine': (lambda u: np.where(u < 1., np.cos(np.pi * np.minimum(u, 1.) / 2.), 0.), 1.),
+}
+
+
+def _check_kernel(kernel):
+    if kernel not in KERNELS:
+        raise ValueError("Unknown kernel '{}'. Possible choices are : {}".format(kernel, ', '.join(KERNELS)))
+
+
+def make_grid(x_min, x_max, kernel, bandwidth, grid_size=512):
+    """
+    Builds a regular grid covering [x_min, x_max] extended by kernel support on both sides.
+
+    :param x_min: minimal data value
+    :type x_min: float
+
+    :param x_max: maximal data value
+    :type x_max: float
+
+    :param kernel: kernel name (see KERNELS)
+    :type kernel: str
+
+    :param bandwidth: kernel bandwidth
+    :type bandwidth: float
+
+    :param grid_size: number of grid points
+    :type grid_size: int, optional
+
+    :return: numpy array of grid points
+    """
+    _check_kernel(kernel)
+    margin = KERNELS[kernel][1] * bandwidth
+    return np.linspace(x_min - margin, x_max + margin, grid_size)
+
+
+def linear_binning(values, grid):
+    """
+    Spreads each value on its two nearest grid points, proportionally to its distance to them.
+
+    :param values: numpy array of float values without NaN
+    :type values: numpy array
+
+    :param grid: regular grid of at least 2 points covering values
+    :type grid: numpy array
+
+    :return: numpy array of weights, one per grid point
+    """
+    step = grid[1] - grid[0]
+    position = (values - grid[0]) / step
+    lower = np.clip(np.floor(position).astype(int), 0, len(grid) - 2)
+    fraction = np.clip(position - lower, 0., 1.)
+    return np.bincount(lower, weights=1. - fraction, minlength=len(grid)) + \
+        np.bincount(lower + 1, weights=fraction, minlength=len(grid))
+
+
+def binned_kde(counts, step, kernel='gaussian', bandwidth=0.75):
+    """
+    Computes kernel density from counts binned on a regular grid, using an FFT convolution with the kernel sampled on
+    the same grid. Cost is O(grid_size log(grid_size)) whatever the number of samples.
+
+    :param counts: numpy array of (possibly fractional) counts per grid point
+    :type counts: numpy array
+
+    :param step: grid step
+    :type step: float
+
+    :param kernel: kernel name (see KERNELS)
+    :type kernel: str, optional
+
+    :param bandwidth: kernel bandwidth
+    :type bandwidth: float, optional
+
+    :return: numpy array of density values on grid points
+    """
+    _check_kernel(kernel)
+    profile, support = KERNELS[kernel]
+    half_width = min(int(ceil(support * bandwidth / step)), len(counts) - 1)
+    weights = profile(np.abs(np.arange(-half_width, half_width + 1)) * step / bandwidth)
+    weights /= weights.sum() * step
+
+    n_fft = 1 << int(ceil(np.log2(len(counts) + len(weights) - 1)))
+    convolution = np.fft.irfft(np.fft.rfft(counts, n_fft) * np.fft.rfft(weights, n_fft), n_fft)
+    density = convolution[half_width:half_width + len(counts)] / counts.sum()
+    # Remove FFT rounding noise
+    return np.clip(density, 0., None)
+
+
+def kde_grid(values, kernel='gaussian', bandwidth=0.75, grid_size=512, method='binned'):
+    """
+    Estimates kernel density of values on a regular grid.
+
+    :param values: array-like of float values. NaN values are ignored
+    :type values: array-like
+
+    :param kernel: kernel name (see KERNELS)
+    :type kernel: str, optional
+
+    :param bandwidth: kernel bandwidth
+    :type bandwidth: float, optional
+
+    :param grid_size: number of grid points
+    :type grid_size: int, optional
+
+    :param method: estimation method. Possible choices are :
+    - 'binned': values are linearly binned on the grid and convolved with the kernel by FFT (linear time)
+    - 'exact': sklearn KernelDensity evaluated on grid points only
+    :type method: str, optional
+
+    :return: tuple of numpy arrays (grid, density). Both are empty when there is no valid value
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.array([]), np.array([])
+
+    grid = make_grid(values.min(), values.max(), kernel, bandwidth, grid_size)
+    if method == 'binned':
+        return grid, binned_kde(linear_binning(values, grid), grid[1] - grid[0], kernel, bandwidth)
+    elif method == 'exact':
+        from sklearn.neighbors import KernelDensity
+        log_density = KernelDensity(kernel=kernel, bandwidth=bandwidth).fit(values[:, None]).score_samples(
+            grid[:, None])
+        return grid, np.exp(log_density)
+    raise ValueError("Unknown kernel density method '{}'. Possible choices are : 'binned', 'exact'".format(method))
@@ -0,0 +1,412 @@
+import logging
+from math import ceil
+
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Number of nanoseconds of dates resolutions
+_NANOSECONDS = {'s': 1e9, 'ms': 1e6, 'us': 1e3, 'ns': 1.}
+
+
+def to_numeric(values):
+    """
+    Converts x values (numbers, dates or pandas index) to a float numpy array usable by downsampling algorithms.
+    Dates are converted to nanoseconds since epoch. Values which can not be converted (ex: categories) are replaced by
+    their position.
+
+    :param values: array-like x values
+    :type values: numpy array, pandas Index or pandas Series
+
+    :return: numpy array of float values
+    """
+    if pd.api.types.is_datetime64_any_dtype(values) or pd.api.types.is_timedelta64_dtype(values):
+        values = pd.DatetimeIndex(values) if pd.api.types.is_datetime64_any_dtype(values) else pd.TimedeltaIndex(values)
+        # Recent pandas versions can store dates with another resolution than nanoseconds, scaled in float rather than
+        # with as_unit which checks overflows of each value
+        return values.asi8.astype(float) * _NANOSECONDS[getattr(values, 'unit', 'ns')]
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.arange(len(values), dtype=float)
+
+
+def to_bound(x, value):
+    """
+    Converts an x range bound (number, date or string date) to a value comparable to x values.
+
+    :param x: x values the bound relates to
+    :type x: array-like
+
+    :param value: bound value
+    :type value: float, str or date
+
+    :return: pandas Timestamp (with x timezone) for dates, float otherwise
+    """
+    if pd.api.types.is_datetime64_any_dtype(x):
+        value = pd.Timestamp(value)
+        timezone = getattr(x.dtype, 'tz', None)
+        if timezone is not None and value.tz is None:
+            value = value.tz_localize(timezone)
+        elif timezone is None and value.tz is not None:
+            value = value.tz_convert(None)
+        return value
+    return float(value)
+
+
+def to_numeric_bound(x, value):
+    """
+    Converts an x range bound (number, date or string date) to the scale of to_numeric(x).
+
+    :param x: x values the bound relates to
+    :type x: array-like
+
+    :param value: bound value
+    :type value: float, str or date
+
+    :return: float value
+    """
+    value = to_bound(x, value)
+    return float(value.value) if isinstance(value, pd.Timestamp) else value
+
+
+def window_positions(x, low=None, high=None, margin=0.):
+    """
+    Finds with binary search the positions of the first and last points of sorted x values to consider for a window.
+    One more point is kept on each side so that lines reach the borders of the window.
+
+    :param x: sorted x values (numpy array or pandas index)
+    :type x: array-like
+
+    :param low: minimal x value of the window, None for no lower bound
+    :type low: float or pandas Timestamp, optional
+
+    :param high: maximal x value of the window, None for no upper bound
+    :type high: float or pandas Timestamp, optional
+
+    :param margin: fraction of window width added on both sides of the window
+    :type margin: float, optional
+
+    :return: tuple (start, end) of positions
+    """
+    if len(x) == 0:
+        return 0, 0
+    low = low if low is not None else x[0]
+    high = high if high is not None else x[-1]
+    width = (high - low) * margin
+    start = max(int(x.searchsorted(low - width, side='left')) - 1, 0)
+    end = min(int(x.searchsorted(high + width, side='right')) + 1, len(x))
+    return start, end
+
+
+def gap_positions(y):
+    """
+    Gets positions of the valid values of y and of the first value of each run of NaN values, so that a run of missing
+    values is sent as a single gap breaking lines instead of one null per row.
+
+    :param y: numpy array of float values
+    :type y: numpy array
+
+    :return: numpy array of sorted positions to keep, None when y has no NaN value
+    """
+    missing = np.isnan(y)
+    if not missing.any():
+        return None
+    keep = ~missing
+    keep[0] = True
+    keep[1:] |= missing[1:] & ~missing[:-1]
+    return np.flatnonzero(keep)
+
+
+def _bucket_matrix(y, n_buckets, fill_value):
+    """
+    Reshapes y into a (n_buckets, bucket_size) matrix, padding the last bucket and NaN values with fill_value.
+    """
+    bucket_size = ceil(len(y) / n_buckets)
+    n_buckets = ceil(len(y) / bucket_size)
+    matrix = np.full(n_buckets * bucket_size, fill_value, dtype=float)
+    matrix[:len(y)] = y
+    matrix[np.isnan(matrix)] = fill_value
+    return matrix.reshape(n_buckets, bucket_size), bucket_size
+
+
+def stride(x, y, n_out):
+    """
+    Keeps one point every ceil(len(y) / n_out) points.
+
+    :param x: numpy array of float x values
+    :type x: numpy array
+
+    :param y: numpy array of float y values
+    :type y: numpy array
+
+    :param n_out: target number of points
+    :type n_out: int
+
+    :return: numpy array of sorted positions to keep
+    """
+    return np.arange(0, len(y), ceil(len(y) / n_out))
+
+
+def min_max(x, y, n_out):
+    """
+    Splits y into n_out / 2 buckets and keeps the minimal and maximal points of each bucket, so that spikes are
+    always preserved.
+
+    :param x: numpy array of float x values
+    :type x: numpy array
+
+    :param y: numpy array of float y values
+    :type y: numpy array
+
+    :param n_out: target number of points
+    :type n_out: int
+
+    :return: numpy array of sorted positions to keep
+    """
+    n_buckets = max(n_out // 2, 1)
+    mins, bucket_size = _bucket_matrix(y, n_buckets, np.inf)
+    maxs, _ = _bucket_matrix(y, n_buckets, -np.inf)
+    offsets = np.arange(mins.shape[0]) * bucket_size
+    positions = np.concatenate([offsets + mins.argmin(axis=1), offsets + maxs.argmax(axis=1)])
+    return np.unique(np.minimum(positions, len(y) - 1))
+
+
+def m4(x, y, n_out):
+    """
+    Splits y into n_out / 4 buckets and keeps the first, last, minimal and maximal points of each bucket (M4
+    aggregation).
+
+    :param x: numpy array of float x values
+    :type x: numpy array
+
+    :param y: numpy array of float y values
+    :type y: numpy array
+
+    :param n_out: target number of points
+    :type n_out: int
+
+    :return: numpy array of sorted positions to keep
+    """
+    n_buckets = max(n_out // 4, 1)
+    mins, bucket_size = _bucket_matrix(y, n_buckets, np.inf)
+    maxs, _ = _bucket_matrix(y, n_buckets, -np.inf)
+    offsets = np.arange(mins.shape[0]) * bucket_size
+    positions = np.concatenate([
+        offsets,
+        offsets + bucket_size - 1,
+        offsets + mins.argmin(axis=1),
+        offsets + maxs.argmax(axis=1)
+    ])
+    return np.unique(np.minimum(positions, len(y) - 1))
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps first and last points and, in each of the n_out - 2 buckets
+    in between, the point forming the largest triangle with the previously kept point and the average of next bucket.
+    Averages of all buckets are computed in one vectorized pass, only the final selection loops over buckets.
+
+    :param x: numpy array of float x values
+    :type x: numpy array
+
+    :param y: numpy array of float y values
+    :type y: numpy array
+
+    :param n_out: target number of points
+    :type n_out: int
+
+    :return: numpy array of sorted positions to keep
+    """
+    n = len(y)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(int) + 1
+    edges[-1] = n - 1
+    starts = edges[:-1]
+
+    valid = ~np.isnan(y[:-1])
+    y_filled = np.where(valid, y[:-1], 0.)
+    counts = np.add.reduceat(valid.astype(float), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_means = np.add.reduceat(x[:-1], starts) / np.diff(edges)
+        y_means = np.add.reduceat(y_filled, starts) / counts
+    # The "next bucket" of the last bucket is the last point
+    x_means = np.append(x_means, x[-1])
+    y_means = np.append(y_means, y[-1])
+
+    positions = np.empty(n_out, dtype=int)
+    positions[0] = 0
+    positions[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        x_a, y_a = x[previous], y[previous]
+        area = np.abs(
+            (x_a - x_means[bucket + 1]) * (y[start:end] - y_a) - (x_a - x[start:end]) * (y_means[bucket + 1] - y_a)
+        )
+        area[np.isnan(area)] = -1
+        previous = start + int(area.argmax())
+        positions[bucket + 1] = previous
+    return positions
+
+
+def bucket_aggregate(values, buckets, positions=True):
+    """
+    Computes statistics of each bucket of rows of values, rows of a bucket being contiguous. Statistics of several
+    slices of the same series can be merged afterwards (see ds_toolbox.chunked.merge_aggregates), so that chunked
+    data can be reduced in parallel.
+
+    :param values: numpy array of float values, of shape (rows,) or (rows, series). NaN values are ignored
+    :type values: numpy array
+
+    :param buckets: sorted numpy array of int bucket numbers, one per row
+    :type buckets: numpy array
+
+    :param positions: Boolean controlling whether or not to compute positions of minimal and maximal rows
+    :type positions: bool, optional
+
+    :return: dict with 'bucket' (numbers of the buckets of values) and 'count', 'sum', 'min', 'max', 'argmin' and
+    'argmax' (positions in values of minimal and maximal rows, first row of the bucket when all values are NaN, only
+    with positions=True) numpy arrays of shape (buckets, series)
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[:, None] if values.ndim == 1 else values
+    n_series = values.shape[1]
+    if len(values) == 0:
+        empty = np.empty((0, n_series))
+        return dict(bucket=np.empty(0, dtype=int), count=empty, sum=empty, min=empty, max=empty,
+                    argmin=empty.astype(int), argmax=empty.astype(int))
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    segments = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)])) if positions else None
+    valid = ~np.isnan(values)
+    count = np.add.reduceat(valid, starts, axis=0)
+    aggregate = dict(
+        bucket=buckets[starts], count=count, sum=np.add.reduceat(np.where(valid, values, 0.), starts, axis=0)
+    )
+    # fmin and fmax ignore NaN values, extremes of buckets without valid values being NaN
+    for name, fill_value, function in [('min', np.inf, np.fmin), ('max', -np.inf, np.fmax)]:
+        aggregate[name] = function.reduceat(values, starts, axis=0)
+        if not positions:
+            continue
+        extremes = np.where(count > 0, aggregate[name], fill_value)
+        rows, columns = np.nonzero(np.where(valid, values, fill_value) == extremes[segments])
+        # Rows are sorted, so that first occurrence of each (bucket, series) couple is its first extreme row
+        couples, first = np.unique(segments[rows] * n_series + columns, return_index=True)
+        aggregate['arg' + name] = np.empty(extremes.shape, dtype=int)
+        aggregate['arg' + name].flat[couples] = rows[first]
+    return aggregate
+
+
+def uniform_bucket_aggregate(x, values, n_buckets):
+    """
+    Computes statistics of values on n_buckets buckets of equal x width, all series being reduced in one vectorized
+    pass against the same bucket boundaries. Reduced series can then be plotted with a regular x (start and step)
+    instead of an x array.
+
+    :param x: sorted numpy array of float x values
+    :type x: numpy array
+
+    :param values: numpy array of float values of shape (rows, series)
+    :type values: numpy array
+
+    :param n_buckets: number of buckets
+    :type n_buckets: int
+
+    :return: tuple (start, width, aggregate), aggregate being a dict of 'count', 'sum', 'min', 'max', 'argmin' and
+    'argmax' (rows of minimal and maximal values, see bucket_aggregate) numpy arrays of shape (n_buckets, series),
+    statistics of empty buckets being NaN (0 for counts and -1 for rows)
+    """
+    values = np.asarray(values, dtype=float)
+    start, end = (x[0], x[-1]) if len(x) > 0 else (0., 1.)
+    width = (end - start) / n_buckets if end > start else 1.
+    buckets = np.minimum(((x - start) // width).astype(int), n_buckets - 1)
+    partial = bucket_aggregate(values, buckets)
+    aggregate = {}
+    for name, fill_value in [('count', 0.), ('sum', np.nan), ('min', np.nan), ('max', np.nan), ('argmin', -1),
+                             ('argmax', -1)]:
+        aggregate[name] = np.full((n_buckets, values.shape[1]), fill_value)
+        aggregate[name][partial['bucket']] = partial[name]
+    return start, width, aggregate
+
+
+DOWNSAMPLERS = {
+    'stride': stride,
+    'minmax': min_max,
+    'm4': m4,
+    'lttb': lttb,
+}
+
+
+def register_downsampler(name, function):
+    """
+    Registers a new downsampling algorithm usable through downsample=name option of plotting functions.
+
+    :param name: name of the algorithm
+    :type name: str
+
+    :param function: callable taking x (float numpy array), y (float numpy array) and n_out (int) arguments and
+    returning a numpy array of positions to keep
+    :type function: callable
+    """
+    DOWNSAMPLERS[name] = function
+
+
+def get_downsampler(method):
+    """
+    Gets downsampling function from its name or returns it if method is already a callable.
+
+    :param method: name of a registered algorithm (see DOWNSAMPLERS) or callable
+    :type method: str or callable
+
+    :return: downsampling callable
+    """
+    if callable(method):
+        return method
+    if method not in DOWNSAMPLERS:
+        raise ValueError(
+            "Unknown downsampling method '{}'. Possible choices are : {}".format(method, ', '.join(DOWNSAMPLERS))
+        )
+    return DOWNSAMPLERS[method]
+
+
+def downsample_positions(x, ys, n_out, method='stride'):
+    """
+    Computes positions of points to keep so that each y series is reduced to about n_out points.
+    The returned positions are the sorted union of positions kept for each y series, so that all series can still share
+    the same x values.
+
+    :param x: x values shared by all series (dates, numbers or pandas index)
+    :type x: array-like
+
+    :param ys: list of y series
+    :type ys: list
+
+    :param n_out: target number of points per series
+    :type n_out: int
+
+    :param method: name of a registered algorithm (see DOWNSAMPLERS) or callable
+    :type method: str or callable, optional
+
+    :return: numpy array of sorted positions to keep
+    """
+    n = len(x)
+    if n_out is None or n <= n_out or n == 0:
+        return np.arange(n)
+
+    function = get_downsampler(method)
+    x_values = to_numeric(x) if function is not stride else None
+    positions = [
+        function(x_values, np.asarray(y, dtype=float), n_out)
+        for y in ys
+    ]
+    if len(positions) == 0:
+        return stride(x_values, np.empty(n), n_out)
+    if len(positions) == 1:
+        return np.asarray(positions[0])
+    return np.unique(np.concatenate(positions))
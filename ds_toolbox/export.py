@@ -0,0 +1,177 @@
+import atexit
+import logging
+import os
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = ['png', 'jpg', 'jpeg', 'webp', 'svg', 'pdf']
+
+# Export options only used for images, other options being given to plotly.io.write_html
+IMAGE_OPTIONS = ['width', 'height', 'scale']
+
+
+# Long-lived renderer of current process, opened on first image export
+_renderer = {}
+
+
+def _get_renderer():
+    """
+    Gets the kaleido renderer of current process, opening its headless browser on first call. The same browser is then
+    reused by all images exported by this process.
+
+    :return: dict with 'kaleido' (kaleido.Kaleido) and 'loop' (asyncio event loop running it) keys
+    """
+    if 'kaleido' not in _renderer:
+        import asyncio
+        import kaleido
+
+        loop = asyncio.new_event_loop()
+        renderer = kaleido.Kaleido()
+        loop.run_until_complete(renderer.open())
+        _renderer.update(kaleido=renderer, loop=loop)
+        atexit.register(_close_renderer)
+    return _renderer
+
+
+def _close_renderer():
+    """
+    Closes the kaleido renderer of current process, if it was opened.
+    """
+    if 'kaleido' in _renderer:
+        loop = _renderer.pop('loop')
+        loop.run_until_complete(_renderer.pop('kaleido').close())
+        loop.close()
+
+
+def _init_worker():
+    """
+    Initializes an export worker process so that its renderer is closed when the pool shuts it down: multiprocessing
+    workers end with os._exit, without running atexit handlers, but run multiprocessing finalizers.
+    """
+    from multiprocessing import util
+
+    util.Finalize(None, _close_renderer, exitpriority=10)
+
+
+def _write_image(figure, path, file_format, write_kwargs):
+    """
+    Renders figure to an image file with the long-lived renderer of current process.
+    """
+    import kaleido
+    import plotly.io as pio
+
+    write_kwargs = {name: value for name, value in write_kwargs.items() if name in IMAGE_OPTIONS}
+    if not hasattr(kaleido, 'Kaleido'):
+        # kaleido < 1 already keeps one renderer subprocess alive per python process
+        pio.write_image(figure, path, format=file_format, **write_kwargs)
+        return
+    renderer = _get_renderer()
+    options = dict(format=file_format, **write_kwargs)
+    figure = figure.to_dict() if hasattr(figure, 'to_plotly_json') else figure
+    image = renderer['loop'].run_until_complete(renderer['kaleido'].calc_fig(figure, opts=options))
+    with open(path, 'wb') as image_file:
+        image_file.write(image)
+
+
+def _build_figure(figure):
+    """
+    Gets a plotly figure (or figure dict, or PNG bytes of a raster backend plot spec) from a figure or from a plot
+    spec.
+    """
+    if isinstance(figure, dict) and 'function' in figure:
+        from ds_toolbox import graphs
+        function = figure['function']
+        function = getattr(graphs, function) if isinstance(function, str) else function
+        kwargs = dict(figure.get('kwargs', {}), show=False, return_figure=True)
+        kwargs.pop('widget', None)
+        return function(*figure.get('args', ()), **kwargs)
+    return figure
+
+
+def _export_figure(figure, path, write_kwargs):
+    """
+    Exports one figure (or plot spec) to path, format being given by path extension. Never raises: failures are
+    reported in the returned dict.
+    """
+    import plotly.io as pio
+
+    start = time.perf_counter()
+    report = {'path': path, 'pid': os.getpid(), 'error': None}
+    try:
+        figure = _build_figure(figure)
+        file_format = os.path.splitext(path)[1][1:].lower()
+        if isinstance(figure, bytes):
+            # Image already rendered by raster backend
+            if file_format != 'png':
+                raise ValueError("Raster backend figures can only be exported to png, not '{}'".format(file_format))
+            with open(path, 'wb') as image_file:
+                image_file.write(figure)
+        elif file_format == 'html':
+            pio.write_html(
+                figure, path, **{name: value for name, value in write_kwargs.items() if name not in IMAGE_OPTIONS}
+            )
+        elif file_format in IMAGE_FORMATS:
+            _write_image(figure, path, file_format, write_kwargs)
+        else:
+            raise ValueError("Unknown export format '{}'. Possible choices are : html, {}".format(
+                file_format, ', '.join(IMAGE_FORMATS)
+            ))
+    except Exception:
+        report['error'] = traceback.format_exc()
+    report['duration'] = time.perf_counter() - start
+    return report
+
+
+def export_figures(figures, paths, n_workers=None, **write_kwargs):
+    """
+    Exports many figures to files (png, jpg, webp, svg, pdf or html depending on paths extensions) using a pool of
+    worker processes. Each worker keeps its own kaleido renderer alive for all the images it exports, instead of
+    starting one renderer per image, and closes it when the pool shuts down. A failing figure does not abort the batch.
+
+    :param figures: list of plotly figures, figure dicts or plot specs. A plot spec is a dict with 'function' (name
+    of a ds_toolbox.graphs function or callable returning a figure), optional 'args' (list) and 'kwargs' (dict) keys,
+    ex: {'function': 'plot_evolution', 'args': [['PACT1'], df], 'kwargs': {'title': 'PACT1'}}. Specs are built in
+    workers with return_figure=True, without FigureWidget. Specs with backend='raster' kwarg are exported to png
+    only.
+    :type figures: list
+
+    :param paths: list of output files paths, one per figure
+    :type paths: list
+
+    :param n_workers: number of worker processes. Defaults to number of CPUs. With 1, figures are exported in current
+    process
+    :type n_workers: int, optional
+
+    :param write_kwargs: optional arguments used for images (width, height, scale, see IMAGE_OPTIONS) or given to
+    plotly.io.write_html for html files (other arguments, ex: include_plotlyjs). Each file only receives the arguments
+    of its format
+
+    :return: list of dicts, one per figure, with 'path', 'duration' (seconds), 'pid' and 'error' (None or traceback
+    string) keys
+    """
+    if len(figures) != len(paths):
+        raise ValueError('figures and paths must have the same length')
+    figures = [figure.to_dict() if hasattr(figure, 'to_plotly_json') else figure for figure in figures]
+    n_workers = n_workers if n_workers is not None else os.cpu_count()
+
+    start = time.perf_counter()
+    if n_workers <= 1:
+        reports = [_export_figure(figure, path, write_kwargs) for figure, path in zip(figures, paths)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker) as executor:
+            reports = list(executor.map(
+                _export_figure, figures, paths, [write_kwargs] * len(figures)
+            ))
+
+    failures = [report for report in reports if report['error'] is not None]
+    logger.info(
+        'Exported %s figures in %.2f s with %s workers (%s failures)',
+        len(reports), time.perf_counter() - start, n_workers, len(failures)
+    )
+    for report in failures:
+        logger.warning('Export of %s failed:\n%s', report['path'], report['error'])
+    return reports
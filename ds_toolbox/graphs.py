@@ -1,14 +1,240 @@
 import logging
-from math import ceil
 
-import pandas as pd
-from sklearn.neighbors import KernelDensity
-import plotly.graph_objects as go
-import numpy as np
+from ds_toolbox.bands import envelope_band, is_envelope
+from ds_toolbox.cache import figure_key, get_cache
+from ds_toolbox.chunked import is_xarray, reduce_xarray
+from ds_toolbox.density import binned_kde, kde_grid, make_grid
+from ds_toolbox.downsampling import (
+    downsample_positions, gap_positions, to_bound, to_numeric, to_numeric_bound, uniform_bucket_aggregate,
+    window_positions
+)
+from ds_toolbox.export import export_figures  # noqa: F401, exposed as part of graphs API
+from ds_toolbox.histograms import HistogramAccumulator, iter_chunks, raster_grid, shared_bin_edges
+from ds_toolbox import profiling
+from ds_toolbox.lazy import lazy_import
+from ds_toolbox.pyramid import is_pyramid
+from ds_toolbox.quantiles import KLLSketch, exact_quantiles
+from ds_toolbox.raster import COLORWAY, raster_bound, raster_x, render_png
+from ds_toolbox.sources import is_dataset, read_dataset
+from ds_toolbox.widgets import PyramidResamplingController, ResamplingController, StreamingFigure
+
+# Heavy dependencies are only imported when a plotting function is called
+pd = lazy_import('pandas')
+go = lazy_import('plotly.graph_objects')
+np = lazy_import('numpy')
 
 logger = logging.getLogger(__name__)
 
+# Total number of points (all traces of a figure) above which webgl='auto' uses WebGL traces
+WEBGL_POINT_THRESHOLD = 100000
+# Maximal number of figures using WebGL in a notebook, browsers limiting the number of WebGL contexts of a page.
+# Only displayed figures and FigureWidgets are counted (see show_figure)
+WEBGL_MAX_CONTEXTS = 8
+WEBGL_TRACE_TYPES = ['scattergl', 'heatmapgl', 'scatter3d', 'surface', 'mesh3d', 'scattermapbox', 'splom']
+_webgl_contexts = {'count': 0}
 
+BACKENDS = ['plotly', 'raster']
+
+
+def reset_webgl_contexts():
+    """
+    Resets the number of displayed WebGL figures counted for WEBGL_MAX_CONTEXTS (ex: after clearing notebook outputs).
+    """
+    _webgl_contexts['count'] = 0
+
+
+def webgl_option(webgl):
+    """
+    Resolves webgl argument against the WebGL figures limit, so that cache keys of figures built with webgl='auto'
+    depend on whether WebGL could still be used (see scatter_class).
+
+    :param webgl: Boolean or 'auto' (see scatter_class)
+    :type webgl: bool or str
+
+    :return: webgl argument, or 'auto' and Boolean indicating whether WEBGL_MAX_CONTEXTS is reached for 'auto'
+    """
+    if webgl == 'auto':
+        return ['auto', _webgl_contexts['count'] >= WEBGL_MAX_CONTEXTS]
+    return webgl
+
+
+def scatter_class(webgl, n_points, webgl_threshold=None):
+    """
+    Gets plotly scatter class to use for a figure.
+
+    :param webgl: Boolean controlling whether or not to use webgl plots, or 'auto' to use them only when n_points is
+    above webgl_threshold and less than WEBGL_MAX_CONTEXTS WebGL figures were already displayed
+    :type webgl: bool or str
+
+    :param n_points: total number of points of all traces of the figure
+    :type n_points: int
+
+    :param webgl_threshold: number of points above which webgl='auto' uses WebGL. Defaults to WEBGL_POINT_THRESHOLD
+    :type webgl_threshold: int, optional
+
+    :return: plotly.graph_objects.Scattergl or plotly.graph_objects.Scatter class
+    """
+    if webgl == 'auto':
+        threshold = webgl_threshold if webgl_threshold is not None else WEBGL_POINT_THRESHOLD
+        use_webgl = n_points > threshold
+        if use_webgl and _webgl_contexts['count'] >= WEBGL_MAX_CONTEXTS:
+            logger.warning(
+                'WebGL figures limit (%s) reached, using SVG plot for %s points. See reset_webgl_contexts',
+                WEBGL_MAX_CONTEXTS, n_points
+            )
+            use_webgl = False
+    else:
+        use_webgl = webgl is True
+    if use_webgl:
+        return go.Scattergl
+    return go.Scatter
+
+
+def _unvalidated(value):
+    """
+    Converts pandas objects (recursively in dicts) to numpy arrays for unvalidated traces. Timezone aware dates are
+    kept as pandas objects, their numpy conversion being an array of python objects.
+    """
+    if isinstance(value, dict):
+        return {name: _unvalidated(item) for name, item in value.items()}
+    if isinstance(value, (pd.Index, pd.Series)) and getattr(value.dtype, 'tz', None) is None:
+        return value.to_numpy()
+    return value
+
+
+def trace_builder(trace_class, fast=False):
+    """
+    Gets a function building traces of a plotly trace class.
+
+    :param trace_class: plotly trace class (ex: plotly.graph_objects.Scatter)
+    :type trace_class: type
+
+    :param fast: Boolean controlling whether or not to build traces as plain dicts of numpy arrays, skipping plotly
+    validation (see plot fast kwarg)
+    :type fast: bool, optional
+
+    :return: function building a trace from its properties
+    """
+    if not fast:
+        return trace_class
+    trace_type = trace_class.__name__.lower()
+
+    def build_trace(**properties):
+        return dict(type=trace_type, **_unvalidated(properties))
+    return build_trace
+
+
+def downsample_df(df, keys, target_number_points, downsample='stride', x=None):
+    """
+    Reduces df rows so that each of the input keys is represented with about target_number_points points.
+
+    :param df: pandas DataFrame containing keys values
+    :type df: pandas DataFrame
+
+    :param keys: list of quantities names corresponding to df pandas DataFrame columns names
+    :type keys: list
+
+    :param target_number_points: int representing number of points to plot for each key. If None, df is returned
+    unchanged
+    :type target_number_points: int
+
+    :param downsample: downsampling algorithm to use. Possible choices are 'stride' (one point every n points),
+    'minmax' (minimal and maximal points of each bucket), 'm4' (first, last, minimal and maximal points of each bucket),
+    'lttb' (Largest-Triangle-Three-Buckets), any algorithm registered with
+    ds_toolbox.downsampling.register_downsampler or a callable
+    :type downsample: str or callable, optional
+
+    :param x: x values used by shape-preserving algorithms. Defaults to df index
+    :type x: array-like, optional
+
+    :return: downsampled pandas DataFrame
+    """
+    if target_number_points is None:
+        return df
+    positions = downsample_positions(
+        x=df.index if x is None else x,
+        ys=[df[key] for key in keys],
+        n_out=target_number_points,
+        method=downsample
+    )
+    return df.iloc[positions]
+
+
+def valid_keys(df, keys):
+    """
+    Gets keys having at least one valid value, all keys being checked in a single vectorized pass.
+
+    :param df: pandas DataFrame containing keys values
+    :type df: pandas DataFrame
+
+    :param keys: list of quantities names corresponding to df pandas DataFrame columns names
+    :type keys: list
+
+    :return: list of keys
+    """
+    if len(keys) == 0:
+        return []
+    has_values = df[list(keys)].notna().any()
+    return [key for key in keys if has_values[key]]
+
+
+def compress_gaps(df, key):
+    """
+    Gets df rows to plot for key, each run of missing key values being collapsed into a single row (see
+    ds_toolbox.downsampling.gap_positions). Sparse sensors which are mostly missing are then sent with one null per
+    gap instead of one null per row.
+
+    :param df: pandas DataFrame containing key values
+    :type df: pandas DataFrame
+
+    :param key: quantity name corresponding to a df pandas DataFrame column name
+    :type key: str
+
+    :return: positions of rows to keep, None to keep all rows
+    """
+    if not pd.api.types.is_float_dtype(df[key]):
+        return None
+    return gap_positions(df[key].to_numpy())
+
+
+def clip_df(df, x_min=None, x_max=None, margin=0.05):
+    """
+    Keeps only df rows whose index is within [x_min, x_max] window extended by a margin, plus one row on each side.
+    Window is found by binary search on the sorted index, so that cost does not depend on the number of rows outside
+    of it.
+
+    :param df: pandas DataFrame indexed by dates or numbers
+    :type df: pandas DataFrame
+
+    :param x_min: minimal index value of the window, None for no lower bound
+    :type x_min: float or string date, optional
+
+    :param x_max: maximal index value of the window, None for no upper bound
+    :type x_max: float or string date, optional
+
+    :param margin: fraction of window width added on both sides of the window
+    :type margin: float, optional
+
+    :return: sliced pandas DataFrame
+    """
+    if x_min is None and x_max is None:
+        return df
+    if not (pd.api.types.is_datetime64_any_dtype(df.index) or pd.api.types.is_numeric_dtype(df.index)):
+        logger.warning('Index of type %s can not be clipped to [x_min, x_max], all rows are kept', df.index.dtype)
+        return df
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    start, end = window_positions(
+        df.index,
+        low=to_bound(df.index, x_min) if x_min is not None else None,
+        high=to_bound(df.index, x_max) if x_max is not None else None,
+        margin=margin
+    )
+    logger.debug('Clipping %s rows to [%s, %s] window', len(df), start, end)
+    return df.iloc[start:end]
+
+
+@profiling.profiled
 def plot(traces, show=True, **kwargs):
     """
     General plot functions used to plot any plotly list of traces.
@@ -31,6 +257,11 @@ def plot(traces, show=True, **kwargs):
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
             See https://plot.ly/python/templates for more informations
+    - x_axis_type string representing x axis type (ex: 'date' for dates given as milliseconds since epoch)
+    - layout dict of additional layout properties (ex: subplots axes), merged with the ones built from other kwargs
+    - fast Boolean controlling whether or not to skip plotly validation: the figure is built at once from traces
+    dicts (or already built traces) and layout dict, without copying nor checking arrays. Traces are expected to be
+    valid (see trace_builder)
 
     :return: plotly figure object
     """
@@ -38,44 +269,210 @@ def plot(traces, show=True, **kwargs):
     y_axis_name = kwargs.pop('y_axis_name', None)
     template = kwargs.pop('template', 'plotly_dark')
     widget = kwargs.pop('widget', False)
-
-    fig = go.Figure()
-    for trace in traces:
-        fig.add_trace(trace)
+    fast = kwargs.pop('fast', False)
+    x_axis_type = kwargs.pop('x_axis_type', None)
+    extra_layout = kwargs.pop('layout', None)
 
     props = {}
     for arg_name in ['x_min', 'x_max', 'y_min', 'y_max']:
         props[arg_name] = kwargs[arg_name] if arg_name in kwargs else None
 
-    fig.update_layout(
-        title=kwargs['title'] if 'title' in kwargs else '',
-        xaxis={'title': x_axis_name,
+    # Titles are given in their {'text': ...} form, strings being only converted by validation
+    layout = dict(
+        title={'text': kwargs['title'] if 'title' in kwargs else ''},
+        xaxis={'title': {'text': x_axis_name},
                'range': [props['x_min'], props['x_max']]},
-        yaxis={'title': y_axis_name,
+        yaxis={'title': {'text': y_axis_name},
                'range': [props['y_min'], props['y_max']]},
         showlegend=True,
         legend=dict(x=-0.1, y=1.1, bgcolor='rgba(0,0,0,0)'),  # use of rgba to make rectangle transparent
         legend_orientation="h",
         template=template
     )
+    if x_axis_type is not None:
+        layout['xaxis']['type'] = x_axis_type
+    for name, value in (extra_layout or {}).items():
+        layout[name] = dict(layout[name], **value) if isinstance(layout.get(name), dict) else value
+
+    if fast:
+        import plotly.io as pio
+
+        with profiling.stage('figure', traces=len(traces), fast=True):
+            # Templates names are only resolved by validation
+            if isinstance(template, str):
+                layout['template'] = pio.templates[template].to_plotly_json()
+            fig = go.Figure(
+                data=[trace.to_plotly_json() if hasattr(trace, 'to_plotly_json') else trace for trace in traces],
+                layout=layout,
+                _validate=False
+            )
+    else:
+        with profiling.stage('figure', traces=len(traces), fast=False):
+            fig = go.Figure()
+            for trace in traces:
+                fig.add_trace(trace)
+        with profiling.stage('layout'):
+            fig.update_layout(**layout)
+
+    if profiling.measures_payload():
+        with profiling.stage('serialize') as record:
+            record['points'] = sum(
+                max([np.size(trace[name]) for name in ['x', 'y', 'z'] if name in trace and trace[name] is not None]
+                    or [0])
+                for trace in fig.data
+            )
+            record['payload_bytes'] = profiling.payload_bytes(fig)
+
+    return show_figure(fig, show=show, widget=widget)
+
+
+def show_figure(fig, show=True, widget=False):
+    """
+    Displays a built figure or converts it to a FigureWidget.
+
+    :param fig: plotly figure object
+    :type fig: plotly.graph_objects.Figure
 
+    :param show: Boolean controlling whether or not to plot the figure
+    :type show: bool, optional
+
+    :param widget: Boolean controlling whether or not to return a plotly FigureWidget
+    :type widget: bool, optional
+
+    :return: plotly figure object, or FigureWidget
+    """
+    # Built figures only hold a browser WebGL context once displayed, exported or cached ones are not counted
+    if (widget or show is True) and any(trace.type in WEBGL_TRACE_TYPES for trace in fig.data):
+        _webgl_contexts['count'] += 1
     if widget:
-        return go.FigureWidget(fig)
+        with profiling.stage('widget'):
+            return go.FigureWidget(fig)
     else:
         if show is True:
-            fig.show()
+            with profiling.stage('show'):
+                fig.show()
         return fig
 
 
-def plot_evolution(keys, df, show=True, additional_traces=None, webgl=False, **kwargs):
+def cache_lookup(cache, name, df, options):
+    """
+    Looks a figure up in a figure cache (see ds_toolbox.cache.FigureCache).
+
+    :param cache: FigureCache or directory path of a FigureCache
+    :type cache: ds_toolbox.cache.FigureCache or str
+
+    :param name: name of the plotting function
+    :type name: str
+
+    :param df: pandas DataFrame of plotted columns
+    :type df: pandas DataFrame
+
+    :param options: plotting arguments and kwargs the figure depends on
+    :type options: dict
+
+    :return: tuple (FigureCache, key, cached plotly figure or None)
+    """
+    cache = get_cache(cache)
+    with profiling.stage('cache', rows=len(df)) as record:
+        key = figure_key(name, df, options)
+        fig = cache.get(key)
+        record['hit'] = fig is not None
+    logger.debug('Figure %s of %s %s cache', key, name, 'found in' if fig is not None else 'missing from')
+    return cache, key, fig
+
+
+def is_raster_backend(backend):
+    """
+    Checks a plotting backend name.
+
+    :param backend: backend name. Possible choices are 'plotly' (interactive plotly figure) and 'raster' (PNG image
+    rendered from numpy arrays, see render_raster)
+    :type backend: str
+
+    :return: True for raster backend
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '{}'. Possible choices are : {}".format(backend, ', '.join(BACKENDS)))
+    return backend == 'raster'
+
+
+def render_raster(layers, is_date=False, show=True, **kwargs):
+    """
+    Renders layers of full resolution numpy arrays to a PNG image without building a plotly figure (see
+    ds_toolbox.raster.render_png), and writes or displays it.
+
+    :param layers: list of raster layers dicts (see ds_toolbox.raster.render_png)
+    :type layers: list
+
+    :param is_date: Boolean indicating whether x values are dates (see ds_toolbox.raster.raster_x)
+    :type is_date: bool, optional
+
+    :param show: Boolean controlling whether or not to display the image in the notebook
+    :type show: bool, optional
+
+    :param kwargs: optional arguments used in plot functions. Used kwargs are x_axis_name, y_axis_name, x_min, x_max,
+    y_min, y_max, title, template, and :
+    - image_path string representing path of the PNG file to write
+    - width int representing image width in pixels (1200 by default)
+    - height int representing image height in pixels (600 by default)
+
+    :return: PNG bytes
+    """
+    with profiling.stage('raster', layers=len(layers)) as record:
+        png = render_png(
+            layers,
+            width=kwargs.get('width', 1200),
+            height=kwargs.get('height', 600),
+            x_range=(raster_bound(kwargs.get('x_min'), is_date), raster_bound(kwargs.get('x_max'), is_date)),
+            y_range=(kwargs.get('y_min'), kwargs.get('y_max')),
+            is_date=is_date,
+            title=kwargs.get('title'),
+            x_axis_name=kwargs.get('x_axis_name'),
+            y_axis_name=kwargs.get('y_axis_name'),
+            template=kwargs.get('template', 'plotly_dark')
+        )
+        record['payload_bytes'] = len(png)
+    if kwargs.get('image_path') is not None:
+        with open(kwargs['image_path'], 'wb') as image_file:
+            image_file.write(png)
+    if show is True:
+        try:
+            from IPython.display import Image, display
+        except ImportError:
+            logger.warning('IPython is required to show raster images, use image_path kwarg to write them instead')
+        else:
+            display(Image(data=png))
+    return png
+
+
+def layer_color(colors, ind):
+    """
+    :return: color of the ind-th series, from colors list if given, from plotly colorway otherwise
+    """
+    if colors is not None and colors[ind] is not None:
+        return colors[ind]
+    return COLORWAY[ind % len(COLORWAY)]
+
+
+@profiling.profiled
+def plot_evolution(keys, df, show=True, additional_traces=None, webgl='auto', **kwargs):
     """
     Plots time evolution of input keys contained in df and add optional additional traces.
 
     :param keys: list of quantities names corresponding to df pandas DataFrame columns names
     :type keys: list
 
-    :param df: pandas DataFrame indexed by string date containing keys values
-    :type df: pandas DataFrame
+    :param df: pandas DataFrame indexed by string date containing keys values. It can also be a Parquet file or
+    directory path or a pyarrow dataset: only keys columns and index column (pandas index stored in Parquet metadata or
+    index_name kwarg) are then read, rows outside of [x_min, x_max] being filtered by the Parquet reader. An xarray
+    Dataset (or DataArray, named after the first key), possibly backed by chunked dask arrays, is reduced chunk by
+    chunk to target_number_points points per key (1000 by default) with downsample='minmax' (default) or 'mean' bucket
+    statistics, only reduced points being loaded (see ds_toolbox.chunked.reduce_xarray). A ds_toolbox.pyramid.Pyramid
+    is queried for the [x_min, x_max] window (whole series by default) at target_number_points points per key (1000 by
+    default) with downsample='minmax' (default) or 'mean', only the buckets of the window being read, each key being
+    drawn through its own points (see ds_toolbox.pyramid.Pyramid.query_series). With widget='resample', the pyramid is
+    queried again on each zoom or pan (see ds_toolbox.pyramid.build_pyramid)
+    :type df: pandas DataFrame, str, pyarrow.dataset.Dataset, xarray.Dataset, xarray.DataArray or Pyramid
 
     :param show: Boolean controlling whether or not to plot the curves
     :type show: bool, optional
@@ -83,8 +480,9 @@ def plot_evolution(keys, df, show=True, additional_traces=None, webgl=False, **k
     :param additional_traces: list of plotly traces to add to current plot
     :type additional_traces: list, optional
 
-    :param webgl: Boolean controlling whether or not to use webgl plots
-    :type webgl: bool, optional
+    :param webgl: Boolean controlling whether or not to use webgl plots. With 'auto' (default), webgl is used when the
+    total number of points of the figure is above webgl_threshold kwarg (see scatter_class)
+    :type webgl: bool or str, optional
 
     :param kwargs: optional arguments used in plot functions.
     Possible kwargs are :
@@ -99,63 +497,439 @@ def plot_evolution(keys, df, show=True, additional_traces=None, webgl=False, **k
     - x_max float value or string date representing maximal value to show along x_axis
     - y_min float value representing minimal value to show along y_axis
     - y_max float value  representing maximal value to show along y_axis
-    - bandwith dict containing up_value and down_value of band_with
+    - bandwith dict (or list of dicts) containing up_value and down_value of band_with. Values are either numbers,
+    rendered as two points bands, or arrays of len(df) values, clipped and downsampled with keys. A dict with a 'key'
+    item describes instead an envelope of that key, moving mean plus and minus k moving standard deviations computed on
+    full resolution data with a 'rolling' window (number of rows or time offset) or an 'ewm' window (span or half-life
+    time offset), ex: {'key': 'PACT1', 'rolling': '1h', 'k': 2} (see ds_toolbox.bands.envelope_band)
     - target_number_points int representing number of points to plot
+    - webgl_threshold int representing total number of points above which webgl='auto' uses webgl plots (defaults to
+    WEBGL_POINT_THRESHOLD)
+    - index_name string representing name of the column used as index when df is a Parquet path or pyarrow dataset
+    - downsample string or callable representing algorithm used to reach target_number_points. Possible choices are
+    'stride' (default), 'minmax', 'm4' and 'lttb' (see downsample_df)
+    - date_encoding string representing how dates index is sent to plotly. Possible choices are 'iso' (default, ISO
+    strings) and 'epoch' (float milliseconds since epoch sent as a binary array, on a date x axis, see encode_dates)
+    - clip_x Boolean or float controlling whether or not to keep only rows within [x_min, x_max] (extended by a margin,
+    5% of the window width with True, or the given fraction) before downsampling and building traces (see clip_df)
+    - widget Boolean controlling whether or not to return a plotly FigureWidget. With widget='resample', full
+    resolution df is kept server-side and the FigureWidget is downsampled again (to target_number_points points per
+    key, 1000 by default, with 'minmax' algorithm by default) on each zoom or pan (see
+    ds_toolbox.widgets.ResamplingController). With widget='stream', a ds_toolbox.widgets.StreamingFigure initialized
+    with df is returned: new rows are then added with its append method (capacity and refresh_interval kwargs are
+    available, target_number_points and downsample being used for each push)
+    - return_figure Boolean controlling whether or not to return the built plotly figure (PNG bytes with raster
+    backend) instead of plotted values, without any FigureWidget (ex: to export it, see ds_toolbox.export)
     - title tile of the graph
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
             See https://plot.ly/python/templates for more informations
+    - fast Boolean controlling whether or not to build traces and figure without plotly validation (see plot)
+    - cache ds_toolbox.cache.FigureCache (or its directory path) where built figures are stored, keyed by the input
+    columns the figure is built from (keys and envelope bands keys) and the plotting arguments. A cached figure is
+    loaded without rebuilding traces nor validating it, plotted values being clipped and downsampled as without cache
+    so that the same DataFrame is returned. Not used with widget='stream' nor raster backend
+    - backend string representing how the figure is rendered. Possible choices are 'plotly' (default) and 'raster'
+    (full resolution data, without downsampling, is aggregated to pixels and rendered to a PNG image written to
+    image_path kwarg and/or displayed, without building a plotly figure, see render_raster). width and height kwargs
+    give the image size in pixels
 
     :return: plotly figure object
     """
+    cache = kwargs.pop('cache', None)
+    options = dict(kwargs, keys=list(keys), webgl=webgl_option(webgl), additional_traces=additional_traces)
+    options.pop('widget', None)
+    options.pop('return_figure', None)
+    pyramid = df if is_pyramid(df) else None
+    pyramid_series = None
+    if is_dataset(df) or is_xarray(df) or pyramid is not None:
+        with profiling.stage('read') as record:
+            if is_dataset(df):
+                df = read_dataset(
+                    df,
+                    columns=list(keys),
+                    index_name=kwargs.pop('index_name', None),
+                    x_min=kwargs.get('x_min'),
+                    x_max=kwargs.get('x_max')
+                )
+            elif is_xarray(df):
+                df = reduce_xarray(
+                    df,
+                    keys,
+                    n_out=kwargs.pop('target_number_points', None) or 1000,
+                    method=kwargs.pop('downsample', None) or 'minmax'
+                )
+            else:
+                pyramid_n_out = kwargs.pop('target_number_points', None) or 1000
+                pyramid_method = kwargs.pop('downsample', None) or 'minmax'
+                pyramid_series = pyramid.query_series(
+                    keys,
+                    x_min=kwargs.get('x_min'),
+                    x_max=kwargs.get('x_max'),
+                    n_out=pyramid_n_out,
+                    method=pyramid_method
+                )
+                df = pd.concat([pyramid_series[key] for key in keys], axis=1, keys=keys).sort_index()
+            record['rows'] = len(df)
+
+    if kwargs.get('widget') == 'stream':
+        kwargs.pop('widget')
+        streaming_figure = StreamingFigure(
+            keys,
+            n_out=kwargs.pop('target_number_points', None),
+            method=kwargs.pop('downsample', 'minmax'),
+            webgl=webgl,
+            **kwargs
+        )
+        streaming_figure.append(df)
+        streaming_figure.flush()
+        return streaming_figure
+
     modes = kwargs.pop('modes', None)
     names = kwargs.pop('names', None)
     colors = kwargs.pop('colors', None)
     widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
     bandwith = kwargs.pop('bandwith', None)
+    webgl_threshold = kwargs.pop('webgl_threshold', None)
     target_number_points = kwargs.pop('target_number_points', None)
+    downsample = kwargs.pop('downsample', None)
+    clip_x = kwargs.pop('clip_x', False)
+    date_encoding = kwargs.pop('date_encoding', 'iso')
+    raster_backend = is_raster_backend(kwargs.pop('backend', 'plotly'))
 
     if 'x_axis_name' not in kwargs:
         kwargs['x_axis_name'] = 'Time'
 
-    if target_number_points is not None:
-        df = df[::ceil(len(df) / target_number_points)]
+    full_df = df
+    if widget == 'resample' and pyramid is None:
+        target_number_points = target_number_points if target_number_points is not None else 1000
+        downsample = downsample if downsample is not None else 'minmax'
+
+    bands = [bandwith] if isinstance(bandwith, dict) else list(bandwith or [])
+    fig = None
+    if cache is not None and not raster_backend:
+        # Figures are keyed by all the input columns they are built from, envelope bands keys included
+        columns = list(dict.fromkeys(list(keys) + [band['key'] for band in bands if is_envelope(band)]))
+        cache, cache_key, fig = cache_lookup(cache, 'plot_evolution', df[columns], options)
+
+    # Array-valued bands are carried as temporary columns, so that they are clipped and downsampled with keys
+    band_columns = {}
+    for ind, band in enumerate(bands):
+        if is_envelope(band):
+            with profiling.stage('envelope', rows=len(df)):
+                band = envelope_band(df[band['key']], **{name: value for name, value in band.items() if name != 'key'})
+        for name in ['up_value', 'down_value']:
+            if np.ndim(band[name]) > 0:
+                band_columns['__band_{}_{}'.format(ind, name)] = np.asarray(band[name])
+                band = dict(band, **{name: '__band_{}_{}'.format(ind, name)})
+        bands[ind] = band
+    if band_columns:
+        df = df.assign(**band_columns)
+
+    if clip_x is not False:
+        with profiling.stage('clip', rows=len(df)) as record:
+            df = clip_df(df, kwargs.get('x_min'), kwargs.get('x_max'), margin=0.05 if clip_x is True else clip_x)
+            record['points'] = len(df)
+
+    if raster_backend:
+        if widget:
+            raise ValueError('widget can not be used with raster backend')
+        if additional_traces is not None:
+            logger.warning('additional_traces are not rendered by raster backend')
+        x_values, is_date = raster_x(df.index)
+        layers = [
+            dict(
+                type='band',
+                x=x_values,
+                **{
+                    bound: np.broadcast_to(
+                        df[band[name]].to_numpy() if isinstance(band[name], str) else band[name], len(df)
+                    )
+                    for bound, name in [('up', 'up_value'), ('down', 'down_value')]
+                },
+                color='rgba(0,100,80,0.4)'
+            )
+            for band in bands
+        ]
+        plotted_keys = valid_keys(df, keys)
+        layers += [
+            dict(
+                type='points' if modes is not None and modes[ind] == 'markers' else 'lines',
+                x=x_values,
+                y=df[key].to_numpy(dtype=float),
+                color=layer_color(colors, ind),
+                name=names[ind] if names is not None else key
+            )
+            for ind, key in enumerate(keys)
+            if key in plotted_keys
+        ]
+        png = render_raster(layers, is_date=is_date, show=show, **kwargs)
+        if return_figure:
+            return png
+        return df.drop(columns=list(band_columns)) if band_columns else df
+
+    with profiling.stage('downsample', rows=len(df)) as record:
+        df = downsample_df(
+            df, keys + list(band_columns), target_number_points,
+            downsample=downsample if downsample is not None else 'stride'
+        )
+        record['points'] = len(df)
+
+    plotted_keys = valid_keys(df, keys)
+    if fig is None:
+        with profiling.stage('traces', keys=len(keys)):
+            plotting_function = scatter_class(
+                webgl,
+                n_points=len(df) * len(keys) + sum(
+                    len(trace.x) for trace in (additional_traces or []) if getattr(trace, 'x', None) is not None
+                ),
+                webgl_threshold=webgl_threshold
+            )
+            plotting_function = trace_builder(plotting_function, fast=kwargs.get('fast', False))
+            x_values, x_axis_type = encode_dates(df.index, date_encoding)
+            if x_axis_type is not None:
+                kwargs['x_axis_type'] = x_axis_type
+
+            traces = []
+            for ind, key in enumerate(keys):
+                if key not in plotted_keys:
+                    continue
+                if pyramid_series is not None:
+                    # Each key is drawn through its own points only, not through the NaN values at other keys points
+                    positions = np.flatnonzero(df.index.isin(pyramid_series[key].index))
+                else:
+                    positions = compress_gaps(df, key)
+                traces.append(plotting_function(
+                    x=x_values[positions] if positions is not None else x_values,
+                    y=df[key].iloc[positions] if positions is not None else df[key],
+                    name=names[ind] if names is not None else key,
+                    mode=modes[ind] if modes is not None else 'lines+markers',
+                    line={"color": colors[ind] if colors is not None else None}
+                ))
+            if additional_traces is not None:
+                traces += additional_traces
+
+            for band in bands:
+                traces += add_horizontal_bandwith(
+                    dict_bandwith={
+                        name: df[value].to_numpy() if isinstance(value, str) else value
+                        for name, value in band.items()
+                    },
+                    x_values=x_values
+                )
+
+        fig = plot(
+            traces=traces,
+            show=False,
+            widget=False,
+            **kwargs
+        )
+        if cache is not None:
+            cache.put(cache_key, fig)
+    fig = show_figure(fig, show=show, widget=widget)
+    if widget == 'resample' and pyramid is not None:
+        PyramidResamplingController(
+            figure=fig,
+            pyramid=pyramid,
+            keys=plotted_keys,
+            n_out=pyramid_n_out,
+            method=pyramid_method
+        )
+    elif widget == 'resample':
+        ResamplingController(
+            figure=fig,
+            df=full_df,
+            keys=plotted_keys,
+            n_out=target_number_points,
+            method=downsample
+        )
+    if widget or return_figure:
+        return fig
+    else:
+        return df.drop(columns=list(band_columns)) if band_columns else df
+
+
+def facet_layout(titles, n_cols, is_date=False, x_axis_name=None):
+    """
+    Builds layout properties of a grid of subplots whose x axes all match the first one. Equivalent to
+    plotly.subplots.make_subplots layout, which is built (and validated) axis by axis and is too slow for hundreds of
+    subplots.
 
-    plotting_function = go.Scattergl if webgl is True else go.Scatter
+    :param titles: list of subplots titles, one subplot being created per title
+    :type titles: list
+
+    :param n_cols: number of subplots per row
+    :type n_cols: int
+
+    :param is_date: Boolean controlling whether or not x axes are date axes
+    :type is_date: bool, optional
+
+    :param x_axis_name: name of x axis, displayed under the first subplot of the last row
+    :type x_axis_name: str, optional
+
+    :return: tuple (layout dict, number of rows)
+    """
+    n_rows = max(int(np.ceil(len(titles) / n_cols)), 1)
+    vertical_spacing = min(0.3 / n_rows, 0.05)
+    horizontal_spacing = 0.03
+    width = (1. - horizontal_spacing * (n_cols - 1)) / n_cols
+    height = (1. - vertical_spacing * (n_rows - 1)) / n_rows
+
+    layout = {'annotations': []}
+    for ind, title in enumerate(titles):
+        row, col = divmod(ind, n_cols)
+        suffix = '' if ind == 0 else str(ind + 1)
+        x_domain = [col * (width + horizontal_spacing), min(col * (width + horizontal_spacing) + width, 1.)]
+        y_top = 1. - row * (height + vertical_spacing)
+        last_row = ind + n_cols >= len(titles)
+        x_axis = dict(domain=x_domain, anchor='y' + suffix, showticklabels=last_row, title={
+            'text': x_axis_name if last_row and col == 0 else None
+        })
+        if ind > 0:
+            x_axis['matches'] = 'x'
+        if is_date:
+            x_axis['type'] = 'date'
+        layout['xaxis' + suffix] = x_axis
+        # Rounding errors must not take domains out of [0, 1]
+        layout['yaxis' + suffix] = dict(domain=[max(y_top - height, 0.), min(y_top, 1.)], anchor='x' + suffix)
+        layout['annotations'].append(dict(
+            text=title, x=(x_domain[0] + x_domain[1]) / 2., y=y_top, xref='paper', yref='paper', xanchor='center',
+            yanchor='bottom', showarrow=False, font={'size': 12}
+        ))
+    return layout, n_rows
+
+
+FACET_AGGREGATIONS = ['minmax', 'mean']
+
+
+@profiling.profiled
+def plot_facets(keys, df, n_cols=4, show=True, webgl='auto', **kwargs):
+    """
+    Plots time evolution of many keys as small multiples: one subplot per key, in a single figure whose x axes are all
+    shared. All keys are reduced in one vectorized pass against the same buckets of equal duration (see
+    ds_toolbox.downsampling.uniform_bucket_aggregate), so that traces are regularly spaced and sent with x0 and dx
+    properties instead of x arrays.
+
+    :param keys: list of quantities names corresponding to df pandas DataFrame columns names
+    :type keys: list
 
+    :param df: pandas DataFrame indexed by dates or numbers containing keys values
+    :type df: pandas DataFrame
+
+    :param n_cols: number of subplots per row
+    :type n_cols: int, optional
+
+    :param show: Boolean controlling whether or not to plot the curves
+    :type show: bool, optional
+
+    :param webgl: Boolean controlling whether or not to use webgl plots (see scatter_class)
+    :type webgl: bool or str, optional
+
+    :param kwargs: optional arguments used in plot functions.
+    Possible kwargs are :
+    - colors: list of string relative to curves colors (ex: colors= ['red', 'blue'])
+    - names: list of string representing subplots titles
+    - target_number_points int representing number of points to plot for each key (400 by default)
+    - aggregation string representing statistics of each bucket. Possible choices are 'minmax' (default, minimal and
+    maximal values in the order they occur, so that spikes and trends are preserved) and 'mean'
+    - facet_height int representing height in pixels of each row of subplots
+    - x_axis_name string representing name of x axis
+    - x_min float value or string date representing minimal value to show along x_axis
+    - x_max float value or string date representing maximal value to show along x_axis
+    - widget Boolean controlling whether or not to return a plotly FigureWidget
+    - fast Boolean controlling whether or not to build traces and figure without plotly validation (see plot)
+    - return_figure Boolean controlling whether or not to return the built plotly figure instead of plotted values,
+    without any FigureWidget (ex: to export it, see ds_toolbox.export)
+    - title tile of the graph
+    - template string indicating plotly graph template to use. Possible choices are :
+            "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
+            See https://plot.ly/python/templates for more informations
+
+    :return: pandas DataFrame of plotted values indexed by their x
+    """
+    names = kwargs.pop('names', None)
+    colors = kwargs.pop('colors', None)
+    widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
+    target_number_points = kwargs.pop('target_number_points', None) or 400
+    aggregation = kwargs.pop('aggregation', 'minmax')
+    facet_height = kwargs.pop('facet_height', 150)
+    if aggregation not in FACET_AGGREGATIONS:
+        raise ValueError("Unknown facet aggregation '{}'. Possible choices are : {}".format(
+            aggregation, ', '.join(FACET_AGGREGATIONS)
+        ))
+    x_axis_name = kwargs.pop('x_axis_name', 'Time')
+
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    df = clip_df(df, kwargs.get('x_min'), kwargs.get('x_max'), margin=0.)
+    index = df.index
+    is_date_index = pd.api.types.is_datetime64_any_dtype(index)
+    if is_date_index and index.tz is not None:
+        # Buckets are laid out in local wall time, as plotly displays dates
+        index = index.tz_localize(None)
+
+    n_buckets = max(target_number_points // 2, 1) if aggregation == 'minmax' else max(target_number_points, 1)
+    with profiling.stage('reduce', rows=len(df), points=n_buckets * len(keys)):
+        start, width, aggregate = uniform_bucket_aggregate(
+            to_numeric(index), df[keys].to_numpy(dtype=float), n_buckets
+        )
+    if aggregation == 'minmax':
+        # Extremes of each bucket in the order of their rows, at first and third quarters of the bucket
+        min_first = aggregate['argmin'] <= aggregate['argmax']
+        values = np.stack([
+            np.where(min_first, aggregate['min'], aggregate['max']),
+            np.where(min_first, aggregate['max'], aggregate['min'])
+        ], axis=1).reshape(2 * n_buckets, len(keys))
+        x0, dx = start + width / 4., width / 2.
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = aggregate['sum'] / aggregate['count']
+        x0, dx = start + width / 2., width
+    x_positions = x0 + np.arange(len(values)) * dx
+    if is_date_index:
+        reduced = pd.DataFrame(values, index=pd.to_datetime(x_positions.astype('int64')), columns=keys)
+        # plotly date axes take dates steps in milliseconds
+        x0, dx = pd.Timestamp(int(x0)).isoformat(), dx / 1e6
+    else:
+        reduced = pd.DataFrame(values, index=x_positions, columns=keys)
+
+    titles = [names[ind] if names is not None else key for ind, key in enumerate(keys)]
+    layout, n_rows = facet_layout(titles, n_cols, is_date=is_date_index, x_axis_name=x_axis_name)
+    plotting_function = trace_builder(
+        scatter_class(webgl, n_points=len(values) * len(keys)), fast=kwargs.get('fast', False)
+    )
+    plotted_keys = valid_keys(reduced, keys)
     traces = [
         plotting_function(
-            x=df.index,
-            y=df[key],
+            x0=x0,
+            dx=dx,
+            y=reduced[key].to_numpy(),
             name=names[ind] if names is not None else key,
-            mode=modes[ind] if modes is not None else 'lines+markers',
-            line={"color": colors[ind] if colors is not None else None}
+            mode='lines',
+            line={"color": colors[ind] if colors is not None else None},
+            xaxis='x' if ind == 0 else 'x{}'.format(ind + 1),
+            yaxis='y' if ind == 0 else 'y{}'.format(ind + 1)
         )
         for ind, key in enumerate(keys)
-        if not df[key].isna().all()
+        if key in plotted_keys
     ]
-    if additional_traces is not None:
-        traces += additional_traces
-
-    if bandwith is not None:
-        if isinstance(bandwith, dict):
-            traces += add_horizontal_bandwith(dict_bandwith=bandwith, x_values=df.index)
-        elif isinstance(bandwith, list):
-            for item in bandwith:
-                traces += add_horizontal_bandwith(dict_bandwith=item, x_values=df.index)
 
+    # Legend is replaced by subplots titles
+    layout.update(showlegend=False, height=max(facet_height * n_rows, 300))
     fig = plot(
         traces=traces,
-        show=show,
-        widget=widget,
+        show=False,
+        widget=False,
+        layout=layout,
         **kwargs
     )
-    if widget:
-        return fig
-    else:
-        return df
+    fig = show_figure(fig, show=show, widget=widget)
+    return fig if widget or return_figure else reduced
 
 
+@profiling.profiled
 def plot_hist(keys, df, quantiles=None, show=True, **kwargs):
     """
     Plots histogram distribution of input keys contained in df and add optional vertical lines.
@@ -163,8 +937,10 @@ def plot_hist(keys, df, quantiles=None, show=True, **kwargs):
     :param keys: list of quantities names corresponding to df pandas DataFrame columns names
     :type keys: list
 
-    :param df: pandas DataFrame indexed by string date containing keys values
-    :type df: pandas DataFrame
+    :param df: pandas DataFrame indexed by string date containing keys values. With binning='server', it can also be
+    an iterable of pandas DataFrames chunks (ex: pandas.read_csv(..., chunksize=...)) which are binned one after the
+    other, in which case the returned value is the DataFrame of counts per bin
+    :type df: pandas DataFrame or iterable
 
     :param quantiles: list of float values between 0 and 1 representing quantiles to plot as a vertical bar (with
     values plotted in scientif notation). The quantiles will be ploted relative to first quantity of keys list.
@@ -187,64 +963,217 @@ def plot_hist(keys, df, quantiles=None, show=True, **kwargs):
     - x_max float value or string date representing maximal value to show along x_axis
     - y_min float value representing minimal value to show along y_axis
     - y_max float value  representing maximal value to show along y_axis
+    - return_figure Boolean controlling whether or not to return the built plotly figure (PNG bytes with raster
+    backend) instead of plotted values, without any FigureWidget (ex: to export it, see ds_toolbox.export)
     - title tile of the graph
     - target_number_points int representing number of points to plot
-    - nbinsx int representing the number of histograms bars to use
+    - downsample string or callable representing algorithm used to reach target_number_points. Possible choices are
+    'stride' (default), 'minmax', 'm4' and 'lttb' (see downsample_df)
+    - nbinsx int representing the number of histograms bars to use (100 by default with binning='server')
+    - binning string representing where histograms are computed. Possible choices are 'client' (default, raw values
+    are sent to plotly.js) and 'server' (counts are computed with numpy on one set of edges shared by all keys and sent
+    as bars, so that figure size only depends on the number of bins)
+    - bin_range tuple of (min, max) values covered by bins with binning='server'. Required for chunked data
+    - quantile_method string representing how quantiles are computed. Possible choices are 'exact' (default for
+    DataFrame input, all quantiles computed in one pass) and 'sketch' (default for chunked data, approximate quantiles
+    from a mergeable ds_toolbox.quantiles.KLLSketch updated chunk after chunk)
+    - sketch_size int representing KLL sketch size with quantile_method='sketch' (rank error is about 1.7 / sketch_size)
+    - kernel_density string representing kernel used to add a density curve (ex: 'gaussian', 'epanechnikov', see
+    ds_toolbox.density.KERNELS)
+    - kernel_bandwith float representing kernel bandwith
+    - kernel_grid_size int representing number of points on which density is evaluated
+    - kernel_method string representing density estimation method. Possible choices are 'binned' (default, FFT
+    convolution of binned counts) and 'exact' (sklearn KernelDensity evaluated on the grid)
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
             See https://plot.ly/python/templates for more informations
+    - cache ds_toolbox.cache.FigureCache (or its directory path) where built figures are stored, keyed by keys columns
+    and the plotting arguments. A cached figure is loaded without binning data nor validating the figure. Only used
+    with DataFrame input
+    - backend string representing how the figure is rendered. Possible choices are 'plotly' (default) and 'raster'
+    (bins are computed as with binning='server' and rendered to a PNG image written to image_path kwarg and/or
+    displayed, without building a plotly figure, see render_raster). width and height kwargs give the image size in
+    pixels. Quantiles are drawn without annotations
 
     :return: plotly figure object
     """
+    cache = kwargs.pop('cache', None)
+    options = dict(kwargs, keys=list(keys), quantiles=quantiles)
+    options.pop('widget', None)
+    options.pop('return_figure', None)
     # No need to use webgl here because points are aggregated
     names = kwargs.pop('names', None)
     colors = kwargs.pop('colors', None)
     widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
     kernel_density = kwargs.pop('kernel_density', None)
     kernel_bandwith = kwargs.pop('kernel_bandwith', 0.75)
+    kernel_grid_size = kwargs.pop('kernel_grid_size', 512)
+    kernel_method = kwargs.pop('kernel_method', 'binned')
     target_number_points = kwargs.pop('target_number_points', None)
-    nbinsx = kwargs.pop('nbinsx', None) if kernel_density is None else kwargs.pop('nbinsx', int(len(df) / 2))
+    downsample = kwargs.pop('downsample', 'stride')
+    nbinsx = kwargs.pop('nbinsx', None)
+    binning = kwargs.pop('binning', 'client')
+    bin_range = kwargs.pop('bin_range', None)
+    quantile_method = kwargs.pop('quantile_method', None)
+    sketch_size = kwargs.pop('sketch_size', 200)
+    raster_backend = is_raster_backend(kwargs.pop('backend', 'plotly'))
     quantiles = quantiles if quantiles is not None else []
-
-    if target_number_points is not None:
-        df = df[::ceil(len(df) / target_number_points)]
-
-    traces = [
-        go.Histogram(
-            x=df[key],
-            name=names[ind] if names is not None else key,
-            nbinsx=nbinsx,  # To specify the maximum number of bins
-            marker={"color": colors[ind] if colors is not None else None},
-            histnorm="probability density" if kernel_density is not None else None
-        )
-        for ind, key in enumerate(keys)
-        if not df[key].isna().all()
-    ]
+    if raster_backend and widget:
+        raise ValueError('widget can not be used with raster backend')
+
+    if cache is not None and not raster_backend and isinstance(df, pd.DataFrame):
+        cache, cache_key, fig = cache_lookup(cache, 'plot_hist', df[keys], options)
+        if fig is not None:
+            fig = show_figure(fig, show=show, widget=widget)
+            if widget or return_figure:
+                return fig
+            return downsample_df(df, keys, target_number_points, downsample=downsample)
+    else:
+        cache = None
 
     if 'y_axis_name' not in kwargs:
         kwargs['y_axis_name'] = 'Number of elements' if kernel_density is None else None
 
-    if kernel_density is not None:
-        for key in keys:
-            log_dens = KernelDensity(
+    if binning == 'server' or raster_backend:
+        edges = shared_bin_edges(df, keys, nbinsx if nbinsx is not None else 100, bin_range=bin_range)
+        accumulator = HistogramAccumulator(
+            keys=keys,
+            edges=edges,
+            kde_grid=None if kernel_density is None else make_grid(
+                edges[0], edges[-1], kernel_density, kernel_bandwith, kernel_grid_size
+            )
+        )
+        if isinstance(df, pd.DataFrame):
+            df = downsample_df(df, keys, target_number_points, downsample=downsample)
+        else:
+            quantile_method = 'sketch' if quantile_method is None else quantile_method
+            if quantile_method != 'sketch' and len(quantiles) > 0:
+                raise ValueError("quantiles of chunked data can only be computed with quantile_method='sketch'")
+        sketch = KLLSketch(k=sketch_size) if quantile_method == 'sketch' and len(quantiles) > 0 else None
+        with profiling.stage('binning', bins=len(edges) - 1) as record:
+            record['rows'] = 0
+            for chunk in iter_chunks(df):
+                accumulator.update(chunk)
+                if sketch is not None:
+                    sketch.update(chunk[keys[0]].to_numpy(dtype=float))
+                record['rows'] += len(chunk)
+        if not isinstance(df, pd.DataFrame):
+            df = accumulator.to_df()
+
+        heights = {
+            key: accumulator.counts[key] if kernel_density is None else accumulator.densities(key)
+            for key in keys
+            if accumulator.counts[key].sum() > 0
+        }
+        curves = {
+            key: binned_kde(
+                accumulator.kde_counts[key],
+                accumulator.kde_grid[1] - accumulator.kde_grid[0],
                 kernel=kernel_density,
                 bandwidth=kernel_bandwith
-            ).fit(df[key].values[:, None]).score_samples(df[key].values[:, None])
-            density_values =  np.exp(log_dens)
-            dkernel = pd.DataFrame(data={key: df[key].values, 'density': density_values}).sort_values(by=key)
-            traces.append(
+            )
+            for key in keys
+            if kernel_density is not None and accumulator.kde_counts[key].sum() > 0
+        }
+        traces = [] if raster_backend else [
+            go.Bar(
+                x=accumulator.centers,
+                y=heights[key],
+                width=accumulator.widths,
+                name=names[ind] if names is not None else key,
+                marker={"color": colors[ind] if colors is not None else None}
+            )
+            for ind, key in enumerate(keys)
+            if key in heights
+        ]
+        if kernel_density is not None and not raster_backend:
+            traces += [
                 go.Scatter(
-                    x=dkernel[key],
-                    y=dkernel['density'],
+                    x=accumulator.kde_grid,
+                    y=curves[key],
                     name=key + ' ' + kernel_density + 'density',
                     mode='lines'
                 )
+                for key in curves
+            ]
+    elif binning == 'client':
+        sketch = None
+        with profiling.stage('downsample', rows=len(df)) as record:
+            df = downsample_df(df, keys, target_number_points, downsample=downsample)
+            record['points'] = len(df)
+        plotted_keys = valid_keys(df, keys)
+
+        traces = [
+            go.Histogram(
+                x=df[key],
+                name=names[ind] if names is not None else key,
+                nbinsx=nbinsx,  # To specify the maximum number of bins
+                marker={"color": colors[ind] if colors is not None else None},
+                histnorm="probability density" if kernel_density is not None else None
+            )
+            for ind, key in enumerate(keys)
+            if key in plotted_keys
+        ]
+
+        if kernel_density is not None:
+            for key in plotted_keys:
+                grid, density_values = kde_grid(
+                    df[key].values,
+                    kernel=kernel_density,
+                    bandwidth=kernel_bandwith,
+                    grid_size=kernel_grid_size,
+                    method=kernel_method
+                )
+                if len(grid) == 0:
+                    continue
+                traces.append(
+                    go.Scatter(
+                        x=grid,
+                        y=density_values,
+                        name=key + ' ' + kernel_density + 'density',
+                        mode='lines'
+                    )
+                )
+    else:
+        raise ValueError("Unknown binning '{}'. Possible choices are : 'client', 'server'".format(binning))
+
+    with profiling.stage('quantiles', quantiles=len(quantiles)):
+        if sketch is not None:
+            quantile_values = sketch.quantiles(quantiles)
+        elif quantile_method in (None, 'exact'):
+            quantile_values = exact_quantiles(df[keys[0]].to_numpy(dtype=float), quantiles)
+        elif quantile_method == 'sketch':
+            quantile_values = KLLSketch(k=sketch_size).update(df[keys[0]].to_numpy(dtype=float)).quantiles(quantiles)
+        else:
+            raise ValueError(
+                "Unknown quantile_method '{}'. Possible choices are : 'exact', 'sketch'".format(quantile_method)
             )
 
+    if raster_backend:
+        # Bars of keys are stacked as with barmode='stack'
+        bases = np.zeros(len(accumulator.centers))
+        layers = []
+        for ind, key in enumerate(keys):
+            if key not in heights:
+                continue
+            layers.append(dict(
+                type='bars', x=accumulator.centers, width=accumulator.widths, y=bases + heights[key], base=bases,
+                color=layer_color(colors, ind), name=names[ind] if names is not None else key
+            ))
+            bases = bases + heights[key]
+        layers += [
+            dict(type='lines', x=accumulator.kde_grid, y=curve, color=layer_color(None, len(keys) + ind))
+            for ind, curve in enumerate(curves.values())
+        ]
+        layers += [dict(type='vline', x=quantile_value, color='#808080') for quantile_value in quantile_values]
+        png = render_raster(layers, show=show, **kwargs)
+        return png if return_figure else df
+
     fig = plot(
         traces=traces,
         show=False,
-        widget=widget,
+        widget=False,
         **kwargs
     )
 
@@ -254,45 +1183,48 @@ def plot_hist(keys, df, quantiles=None, show=True, **kwargs):
             go.layout.Shape(
                 type="line",
                 yref="paper",
-                x0=df[keys[0]].quantile(quantile),  # quantiles only for first key
+                x0=quantile_value,  # quantiles only for first key
                 y0=0,
-                x1=df[keys[0]].quantile(quantile),
+                x1=quantile_value,
                 y1=1
             )
-            for quantile in quantiles
-            if not df[keys[0]].isna().all()
+            for quantile_value in quantile_values
         ],
         annotations=[
             dict(
-                x=df[keys[0]].quantile(quantile),
+                x=quantile_value,
                 y=1,
                 xref='x',
                 yref='paper',
                 xanchor='left',
-                text='Q' + str(quantile) + ': ' + str(format(df[keys[0]].quantile(quantile), ".2e")),
+                text='Q' + str(quantile) + ': ' + str(format(quantile_value, ".2e")),
                 showarrow=False,
                 arrowhead=0,
             )
-            for quantile in quantiles
-            if not df[keys[0]].isna().all()
+            for quantile, quantile_value in zip(quantiles, quantile_values)
         ]
     )
-    if widget:
-        return go.FigureWidget(fig)
+    if cache is not None:
+        cache.put(cache_key, fig)
+    fig = show_figure(fig, show=show, widget=widget)
+    if widget or return_figure:
+        return fig
     else:
-        if show is True:
-            fig.show()
         return df
     
 
-def plot_xy(df, x_name, y_names, z_name=None, show=True, date_format='%Y-%m-%dT%H:%M:%SZ', webgl=False, **kwargs):
+@profiling.profiled
+def plot_xy(df, x_name, y_names, z_name=None, show=True, date_format='%Y-%m-%dT%H:%M:%SZ', webgl='auto',
+            **kwargs):
     """
     Plots evolution of one or several input keys (in y_names) regarding an other one (x_name).
     It is possible to add an extra quantity used as markers coloration (using z_name)
     It also returns the pandas DataFrame used to perform the plot.
 
     :param df: pandas DataFrame containing columns relative to y_names, x_name and optional z_name quantities.
-    :type df: pandas.DataFrame
+    It can also be a Parquet file or directory path or a pyarrow dataset: only x_name, y_names, z_name and index
+    columns are then read, rows whose x_name value is outside of [x_min, x_max] being filtered by the Parquet reader
+    :type df: pandas.DataFrame, str or pyarrow.dataset.Dataset
 
     :param x_name: string, relative to quantity, used as x abscissa and contained in df
     :type x_name: str
@@ -309,8 +1241,9 @@ def plot_xy(df, x_name, y_names, z_name=None, show=True, date_format='%Y-%m-%dT%
     :param date_format: string which indicates date format
     :type date_format: str, optional
 
-    :param webgl: Boolean controlling whether or not to use webgl plots
-    :type webgl: bool, optional
+    :param webgl: Boolean controlling whether or not to use webgl plots. With 'auto' (default), webgl is used when the
+    total number of points of the figure is above webgl_threshold kwarg (see scatter_class)
+    :type webgl: bool or str, optional
 
     :param kwargs: optional arguments used in plot functions.
     Possible kwargs are :
@@ -326,49 +1259,58 @@ def plot_xy(df, x_name, y_names, z_name=None, show=True, date_format='%Y-%m-%dT%
     - y_min float value representing minimal value to show along y_axis
     - y_max float value  representing maximal value to show along y_axis
     - target_number_points int representing number of points to plot
+    - webgl_threshold int representing total number of points above which webgl='auto' uses webgl plots (defaults to
+    WEBGL_POINT_THRESHOLD)
+    - index_name string representing name of the column used as index when df is a Parquet path or pyarrow dataset
+    - downsample string or callable representing algorithm used to reach target_number_points. Possible choices are
+    'stride' (default), 'minmax', 'm4' and 'lttb' (see downsample_df)
+    - hover string representing how hover information is built. Possible choices are 'text' (default, one string per
+    point built in python) and 'template' (vectorized, see xy_hover_properties)
+    - date_encoding string representing how a dates x_name column is sent to plotly. Possible choices are 'iso'
+    (default) and 'epoch' (see encode_dates)
+    - raster Boolean controlling whether or not to aggregate points of all y_names into a single heatmap trace
+    whose size only depends on raster_shape, for millions of points (see xy_raster_trace)
+    - raster_shape tuple of (number of cells along x, number of cells along y) of the heatmap (500 x 500 by default)
+    - raster_reduction string representing statistic of each heatmap cell. Possible choices are 'count' (default
+    without z_name), 'mean' (default with z_name) and 'max' of z_name values
+    - return_figure Boolean controlling whether or not to return the built plotly figure (PNG bytes with raster
+    backend) instead of plotted values, without any FigureWidget (ex: to export it, see ds_toolbox.export)
     - title tile of the graph
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
             See https://plot.ly/python/templates for more informations
+    - fast Boolean controlling whether or not to build traces and figure without plotly validation (see plot)
+    - backend string representing how the figure is rendered. Possible choices are 'plotly' (default) and 'raster'
+    (all points are aggregated to pixels and rendered to a PNG image written to image_path kwarg and/or displayed,
+    without building a plotly figure, see render_raster). width and height kwargs give the image size in pixels
 
     :return: plotly figure object
     """
-
-    plotting_function = go.Scattergl if webgl is True else go.Scatter
+    if is_dataset(df):
+        df = read_dataset(
+            df,
+            columns=[x_name] + list(y_names) + ([z_name] if z_name is not None else []),
+            index_name=kwargs.pop('index_name', None),
+            filter_name=x_name,
+            x_min=kwargs.get('x_min'),
+            x_max=kwargs.get('x_max')
+        )
 
     colors = kwargs.pop('colors', None)
     modes = kwargs.pop('modes', None)
     names = kwargs.pop('names', None)
     widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
     target_number_points = kwargs.pop('target_number_points', None)
+    downsample = kwargs.pop('downsample', 'stride')
+    hover = kwargs.pop('hover', 'text')
+    webgl_threshold = kwargs.pop('webgl_threshold', None)
+    date_encoding = kwargs.pop('date_encoding', 'iso')
+    raster = kwargs.pop('raster', False)
+    raster_shape = kwargs.pop('raster_shape', (500, 500))
+    raster_reduction = kwargs.pop('raster_reduction', None)
+    raster_backend = is_raster_backend(kwargs.pop('backend', 'plotly'))
 
-    if target_number_points is not None:
-        df = df[::ceil(len(df) / target_number_points)]
-
-    marker = dict(color=df[z_name],
-                  colorscale='Jet',
-                  colorbar=dict(title=z_name, len=0.8, lenmode='fraction'),
-                  opacity=0.8) if z_name is not None else None
-    traces = [
-        plotting_function(
-            x=df[x_name],
-            y=df[y_name],
-            name=names[ind] if names is not None else y_name,
-            marker=marker,
-            mode=modes[ind] if modes is not None else 'markers',
-            line={"color": colors[ind] if colors is not None else None},
-            hoverinfo='text',
-            text=[
-                x_name + ' : ' + str(round(df[x_name].iloc[ind], 2)) + '<br>' + y_name + ' : ' + str(
-                    round(df[y_name].iloc[ind], 2)) + ('<br>' + z_name + ' : ' + str(
-                        round(df[z_name].iloc[ind], 2)) if z_name is not None else '') + (
-                        '<br>' + df.index[ind].strftime(date_format)
-                        if isinstance(df.index, pd.core.indexes.datetimes.DatetimeIndex) else '')
-                for ind in range(len(df))]
-        )
-        for ind, y_name in enumerate(y_names)
-        if not df[y_name].isna().all()
-    ]
     if 'y_axis_name' not in kwargs:
         if len(y_names) == 1:
             kwargs['y_axis_name'] = y_names[0]
@@ -376,18 +1318,269 @@ def plot_xy(df, x_name, y_names, z_name=None, show=True, date_format='%Y-%m-%dT%
             kwargs['y_axis_name'] = ''
     if 'x_axis_name' not in kwargs:
         kwargs['x_axis_name'] = x_name
+
+    if raster_backend:
+        if widget:
+            raise ValueError('widget can not be used with raster backend')
+        if z_name is not None:
+            logger.warning('Points are not colored by z_name values with raster backend')
+        x_values, is_date = raster_x(df[x_name])
+        lines = modes is not None and any(mode != 'markers' for mode in modes)
+        # Lines are drawn from left to right
+        order = np.argsort(x_values, kind='stable') if lines and np.any(np.diff(x_values) < 0) else slice(None)
+        plotted_names = valid_keys(df, y_names)
+        png = render_raster(
+            [
+                dict(
+                    type='points' if modes is None or modes[ind] == 'markers' else 'lines',
+                    x=x_values[order],
+                    y=df[y_name].to_numpy(dtype=float)[order],
+                    color=layer_color(colors, ind),
+                    name=names[ind] if names is not None else y_name
+                )
+                for ind, y_name in enumerate(y_names)
+                if y_name in plotted_names
+            ],
+            is_date=is_date,
+            show=show,
+            **kwargs
+        )
+        return png if return_figure else df
+
+    if raster:
+        with profiling.stage('raster', rows=len(df), cells=raster_shape[0] * raster_shape[1]):
+            traces = [xy_raster_trace(
+                df, x_name, y_names, z_name=z_name, shape=raster_shape, reduction=raster_reduction,
+                x_range=(kwargs.get('x_min'), kwargs.get('x_max')), y_range=(kwargs.get('y_min'), kwargs.get('y_max')),
+                fast=kwargs.get('fast', False)
+            )]
+    else:
+        with profiling.stage('downsample', rows=len(df)) as record:
+            df = downsample_df(df, y_names, target_number_points, downsample=downsample, x=df[x_name])
+            record['points'] = len(df) * len(y_names)
+        with profiling.stage('traces', keys=len(y_names)):
+            plotting_function = trace_builder(
+                scatter_class(webgl, n_points=len(df) * len(y_names), webgl_threshold=webgl_threshold),
+                fast=kwargs.get('fast', False)
+            )
+
+            plotted_names = valid_keys(df, y_names)
+            traces = []
+            for ind, y_name in enumerate(y_names):
+                if y_name not in plotted_names:
+                    continue
+                positions = compress_gaps(df, y_name)
+                trace_df = df.iloc[positions] if positions is not None else df
+                x_values, x_axis_type = encode_dates(trace_df[x_name], date_encoding)
+                if x_axis_type is not None:
+                    kwargs['x_axis_type'] = x_axis_type
+                traces.append(plotting_function(
+                    x=x_values,
+                    y=trace_df[y_name],
+                    name=names[ind] if names is not None else y_name,
+                    marker=dict(color=trace_df[z_name],
+                                colorscale='Jet',
+                                colorbar=dict(title=z_name, len=0.8, lenmode='fraction'),
+                                opacity=0.8) if z_name is not None else None,
+                    mode=modes[ind] if modes is not None else 'markers',
+                    line={"color": colors[ind] if colors is not None else None},
+                    **xy_hover_properties(trace_df, x_name, y_name, z_name=z_name, date_format=date_format, hover=hover)
+                ))
     fig = plot(
         traces=traces,
         show=show,
         widget=widget,
         **kwargs
     )
-    if widget:
+    if widget or return_figure:
         return fig
     else:
         return df
 
 
+def xy_raster_trace(df, x_name, y_names, z_name=None, shape=(500, 500), reduction=None, x_range=(None, None),
+                    y_range=(None, None), fast=False):
+    """
+    Builds a single heatmap trace aggregating (x_name, y_name) points of all y_names on a regular grid (see
+    ds_toolbox.histograms.raster_grid).
+
+    :param df: pandas DataFrame containing columns relative to y_names, x_name and optional z_name quantities.
+    :type df: pandas.DataFrame
+
+    :param x_name: string, relative to quantity, used as x abscissa and contained in df
+    :type x_name: str
+
+    :param y_names: list of strings relative to quantities used as y and contained in df
+    :type y_names: list
+
+    :param z_name: string relative to quantity reduced in each cell and contained in df
+    :type z_name: str, optional
+
+    :param shape: (number of columns along x, number of rows along y) of the grid
+    :type shape: tuple, optional
+
+    :param reduction: statistic of each cell. Possible choices are 'count', 'mean' and 'max' (of z_name values).
+    Defaults to 'mean' with z_name and 'count' otherwise
+    :type reduction: str, optional
+
+    :param x_range: (min, max) x values (numbers or dates) covered by the grid, None bounds being data ones
+    :type x_range: tuple, optional
+
+    :param y_range: (min, max) y values covered by the grid, None bounds being data ones
+    :type y_range: tuple, optional
+
+    :param fast: Boolean controlling whether or not to build the trace without plotly validation (see trace_builder)
+    :type fast: bool, optional
+
+    :return: plotly heatmap trace
+    """
+    reduction = reduction if reduction is not None else ('mean' if z_name is not None else 'count')
+    x = df[x_name]
+    x_numeric = to_numeric(x)
+    ys = np.concatenate([df[y_name].to_numpy(dtype=float) for y_name in y_names])
+
+    def grid_range(values, value_range, to_number):
+        if value_range[0] is None and value_range[1] is None:
+            return None
+        return (to_number(value_range[0]) if value_range[0] is not None else np.nanmin(values),
+                to_number(value_range[1]) if value_range[1] is not None else np.nanmax(values))
+
+    x_centers, y_centers, grid = raster_grid(
+        np.tile(x_numeric, len(y_names)),
+        ys,
+        z=np.tile(df[z_name].to_numpy(dtype=float), len(y_names)) if z_name is not None else None,
+        shape=shape,
+        reduction=reduction,
+        x_range=grid_range(x_numeric, x_range, lambda value: to_numeric_bound(x, value)),
+        y_range=grid_range(ys, y_range, float)
+    )
+    if pd.api.types.is_datetime64_any_dtype(x):
+        x_centers = pd.to_datetime(x_centers.astype('int64'))
+        if x.dt.tz is not None:
+            x_centers = x_centers.tz_localize('UTC').tz_convert(x.dt.tz)
+    return trace_builder(go.Heatmap, fast=fast)(
+        x=x_centers,
+        y=y_centers,
+        z=grid,
+        colorscale='Jet',
+        colorbar=dict(title=z_name if reduction != 'count' else 'count', len=0.8, lenmode='fraction'),
+        hoverongaps=False,
+        name=z_name if reduction != 'count' else 'count'
+    )
+
+
+def encode_dates(values, date_encoding='iso'):
+    """
+    Gets x values to send to plotly. With date_encoding='epoch', dates are sent as float milliseconds since epoch (the
+    numeric representation of plotly date axes) which are serialized as a binary typed array instead of ISO strings
+    parsed again by the browser. Timezone aware dates are converted to their local wall time, as plotly displays them.
+
+    :param values: x values
+    :type values: pandas Index or pandas Series
+
+    :param date_encoding: 'iso' (dates are sent unchanged, serialized as ISO strings) or 'epoch'
+    :type date_encoding: str, optional
+
+    :return: tuple (x values, x axis type to use or None)
+    """
+    if date_encoding not in ['iso', 'epoch']:
+        raise ValueError("Unknown date encoding '{}'. Possible choices are : 'iso', 'epoch'".format(date_encoding))
+    if date_encoding == 'iso' or not pd.api.types.is_datetime64_any_dtype(values):
+        return values, None
+    dates = pd.DatetimeIndex(values)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    milliseconds = to_numeric(dates) / 1e6
+    milliseconds[dates.isna()] = np.nan
+    return milliseconds, 'date'
+
+
+# strftime formats which can be produced by numpy datetime_as_string, as (unit, suffix) couples
+_NUMPY_DATE_FORMATS = {
+    '%Y-%m-%dT%H:%M:%SZ': ('s', 'Z'),
+    '%Y-%m-%dT%H:%M:%S': ('s', ''),
+    '%Y-%m-%dT%H:%M': ('m', ''),
+    '%Y-%m-%d': ('D', ''),
+}
+
+
+def format_dates(index, date_format):
+    """
+    Formats a pandas DatetimeIndex as a numpy array of strings. Usual ISO formats are built by numpy in a vectorized
+    way, others fall back to pandas strftime.
+
+    :param index: dates to format
+    :type index: pandas DatetimeIndex
+
+    :param date_format: string which indicates date format
+    :type date_format: str
+
+    :return: numpy array of strings
+    """
+    if date_format not in _NUMPY_DATE_FORMATS:
+        return index.strftime(date_format).to_numpy()
+    unit, suffix = _NUMPY_DATE_FORMATS[date_format]
+    values = index.tz_localize(None).to_numpy() if index.tz is not None else index.to_numpy()
+    formatted = np.datetime_as_string(values, unit=unit)
+    return np.char.add(formatted, suffix) if suffix else formatted
+
+
+def xy_hover_properties(df, x_name, y_name, z_name=None, date_format='%Y-%m-%dT%H:%M:%SZ', hover='text'):
+    """
+    Builds hover properties of a plot_xy trace.
+
+    :param df: pandas DataFrame containing columns relative to y_name, x_name and optional z_name quantities.
+    :type df: pandas.DataFrame
+
+    :param x_name: string, relative to quantity, used as x abscissa and contained in df
+    :type x_name: str
+
+    :param y_name: string relative to quantity used as y curve and contained in df
+    :type y_name: str
+
+    :param z_name: string relative to quantity, used as optional marker coloration and contained in df
+    :type z_name: str, optional
+
+    :param date_format: string which indicates date format
+    :type date_format: str, optional
+
+    :param hover: string representing how hover information is built. Possible choices are :
+    - 'text': one hover string per point, built in python
+    - 'template': a plotly hovertemplate referencing x, y and marker color values of the trace, dates being formatted
+    once for all points and passed as customdata. Cost does not depend on python row iteration.
+    :type hover: str, optional
+
+    :return: dict of plotly trace properties
+    """
+    is_date_index = isinstance(df.index, pd.DatetimeIndex)
+    if hover == 'template':
+        def value_format(name):
+            return ':.2f' if pd.api.types.is_numeric_dtype(df[name]) else ''
+
+        hovertemplate = x_name + ' : %{x' + value_format(x_name) + '}<br>' + \
+            y_name + ' : %{y' + value_format(y_name) + '}'
+        if z_name is not None:
+            hovertemplate += '<br>' + z_name + ' : %{marker.color' + value_format(z_name) + '}'
+        if is_date_index:
+            hovertemplate += '<br>%{customdata}'
+        return dict(
+            hovertemplate=hovertemplate + '<extra></extra>',
+            customdata=format_dates(df.index, date_format) if is_date_index else None
+        )
+    elif hover == 'text':
+        return dict(
+            hoverinfo='text',
+            text=[
+                x_name + ' : ' + str(round(df[x_name].iloc[ind], 2)) + '<br>' + y_name + ' : ' + str(
+                    round(df[y_name].iloc[ind], 2)) + ('<br>' + z_name + ' : ' + str(
+                        round(df[z_name].iloc[ind], 2)) if z_name is not None else '') + (
+                        '<br>' + df.index[ind].strftime(date_format) if is_date_index else '')
+                for ind in range(len(df))]
+        )
+    raise ValueError("Unknown hover mode '{}'. Possible choices are : 'text', 'template'".format(hover))
+
+
+@profiling.profiled
 def plot_bar(keys, x, df, show=True, **kwargs):
     """
     Plots bar from input keys, a pandas DataFrame df and a list of names used in x used in x axis.
@@ -416,6 +1609,8 @@ def plot_bar(keys, x, df, show=True, **kwargs):
     - x_max float value or string date representing maximal value to show along x_axis
     - y_min float value representing minimal value to show along y_axis
     - y_max float value  representing maximal value to show along y_axis
+    - return_figure Boolean controlling whether or not to return the built plotly figure instead of plotted values,
+    without any FigureWidget (ex: to export it, see ds_toolbox.export)
     - title tile of the graph
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
@@ -426,6 +1621,7 @@ def plot_bar(keys, x, df, show=True, **kwargs):
     names = kwargs.pop('names', None)
     colors = kwargs.pop('colors', None)
     widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
 
     traces = [
         go.Bar(
@@ -443,12 +1639,13 @@ def plot_bar(keys, x, df, show=True, **kwargs):
         widget=widget,
         **kwargs
     )
-    if widget:
+    if widget or return_figure:
         return fig
     else:
         return df
 
 
+@profiling.profiled
 def plot_pie_chart(keys, values, show=True, **kwargs):
     """
     Plots pie-charts from keys (list of string names) and associated list of values.
@@ -465,6 +1662,8 @@ def plot_pie_chart(keys, values, show=True, **kwargs):
     :param kwargs: optional arguments used in plot functions.
     Possible kwargs are :
     - colors: list of string relative to area colors (ex: colors= ['red', 'blue', 'orange'])
+    - return_figure Boolean controlling whether or not to return the built plotly figure instead of plotted values,
+    without any FigureWidget (ex: to export it, see ds_toolbox.export)
     - title tile of the graph
     - template string indicating plotly graph template to use. Possible choices are :
             "plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none".
@@ -474,6 +1673,7 @@ def plot_pie_chart(keys, values, show=True, **kwargs):
     """
     colors = kwargs.pop('colors', None)
     widget = kwargs.pop('widget', False)
+    return_figure = kwargs.pop('return_figure', False)
     traces = [
         go.Pie(
             labels=keys,
@@ -487,32 +1687,38 @@ def plot_pie_chart(keys, values, show=True, **kwargs):
         widget=widget,
         **kwargs
     )
-    if widget:
+    if widget or return_figure:
         return fig
     else:
         return values
 
 
 def add_horizontal_bandwith(dict_bandwith, x_values):
-    return [
-        go.Scatter(
-            x=x_values,
-            y=[dict_bandwith['up_value']] * len(x_values) if isinstance(
-                dict_bandwith['up_value'], int) or isinstance(dict_bandwith['up_value'], float) else dict_bandwith[
-                'up_value'],
-            fillcolor='rgba(0,100,80,0.5)',
-            line=dict(color='rgba(0,0,0,0)'),
-            fill='none',
-            showlegend=False
-        ),
-        go.Scatter(
-            x=x_values,
-            y=[dict_bandwith['down_value']] * len(x_values) if isinstance(
-                dict_bandwith['down_value'], int) or isinstance(dict_bandwith['down_value'], float) else dict_bandwith[
-                'down_value'],
-            fillcolor='rgba(0,100,80,0.2)',
+    """
+    Builds traces of a filled horizontal band.
+
+    :param dict_bandwith: dict containing up_value and down_value of the band. Each value is either a number, in which
+    case the band bound is a two points segment spanning x_values, or an array of len(x_values) values
+    :type dict_bandwith: dict
+
+    :param x_values: x values of the band
+    :type x_values: array-like
+
+    :return: list of plotly traces
+    """
+    traces = []
+    for name, fillcolor, fill in [
+        ('up_value', 'rgba(0,100,80,0.5)', 'none'),
+        ('down_value', 'rgba(0,100,80,0.2)', 'tonexty')
+    ]:
+        value = dict_bandwith[name]
+        constant = np.ndim(value) == 0
+        traces.append(go.Scatter(
+            x=[x_values[0], x_values[-1]] if constant and len(x_values) > 0 else x_values,
+            y=[value, value] if constant else value,
+            fillcolor=fillcolor,
             line=dict(color='rgba(0,0,0,0)'),
-            fill='tonexty',
+            fill=fill,
             showlegend=False
-        )
-    ]
\ No newline at end of file
+        ))
+    return traces
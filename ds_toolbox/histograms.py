@@ -0,0 +1,192 @@
+import logging
+
+from ds_toolbox.density import linear_binning
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def iter_chunks(data):
+    """
+    Gets an iterable of pandas DataFrame chunks from a pandas DataFrame or from an iterable of chunks
+    (ex: pandas.read_csv(..., chunksize=...), generator of DataFrames).
+
+    :param data: pandas DataFrame or iterable of pandas DataFrames
+    :type data: pandas DataFrame or iterable
+
+    :return: iterable of pandas DataFrames
+    """
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def shared_bin_edges(df, keys, nbins, bin_range=None):
+    """
+    Computes one set of regular bin edges shared by all keys.
+
+    :param df: pandas DataFrame containing keys values. Only used when bin_range is None
+    :type df: pandas DataFrame
+
+    :param keys: list of quantities names corresponding to df pandas DataFrame columns names
+    :type keys: list
+
+    :param nbins: number of bins
+    :type nbins: int
+
+    :param bin_range: (min, max) tuple of values covered by bins. Defaults to min and max of all keys values
+    :type bin_range: tuple, optional
+
+    :return: numpy array of nbins + 1 edges
+    """
+    if bin_range is None:
+        if not isinstance(df, pd.DataFrame):
+            raise ValueError('bin_range is required to bin chunked data')
+        values = df[keys].to_numpy(dtype=float)
+        if np.isnan(values).all():
+            bin_range = (0., 1.)
+        else:
+            bin_range = (np.nanmin(values), np.nanmax(values))
+    low, high = float(bin_range[0]), float(bin_range[1])
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, nbins + 1)
+
+
+class HistogramAccumulator:
+    """
+    Accumulates histogram counts (and optionally kernel density grid counts) of several keys, chunk after chunk, so
+    that data which does not fit in memory can be binned. Memory usage only depends on the number of bins.
+    Values outside of edges are ignored.
+
+    :param keys: list of quantities names
+    :type keys: list
+
+    :param edges: numpy array of regular bin edges shared by all keys
+    :type edges: numpy array
+
+    :param kde_grid: regular grid on which values are linearly binned for kernel density estimation
+    :type kde_grid: numpy array, optional
+    """
+
+    def __init__(self, keys, edges, kde_grid=None):
+        self.keys = keys
+        self.edges = edges
+        self.kde_grid = kde_grid
+        self.counts = {key: np.zeros(len(edges) - 1) for key in keys}
+        self.kde_counts = {key: np.zeros(len(kde_grid)) for key in keys} if kde_grid is not None else None
+
+    def update(self, chunk):
+        """
+        Adds values of a new chunk.
+
+        :param chunk: pandas DataFrame containing keys values
+        :type chunk: pandas DataFrame
+
+        :return: the accumulator itself
+        """
+        for key in self.keys:
+            values = chunk[key].to_numpy(dtype=float)
+            values = values[(values >= self.edges[0]) & (values <= self.edges[-1])]
+            self.counts[key] += np.histogram(values, bins=self.edges)[0]
+            if self.kde_grid is not None:
+                self.kde_counts[key] += linear_binning(values, self.kde_grid)
+        return self
+
+    @property
+    def centers(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def widths(self):
+        return np.diff(self.edges)
+
+    def densities(self, key):
+        """
+        Gets counts of key normalized as a probability density.
+
+        :param key: quantity name
+        :type key: str
+
+        :return: numpy array of density values, one per bin
+        """
+        total = self.counts[key].sum()
+        return self.counts[key] / (total * self.widths) if total > 0 else self.counts[key]
+
+    def to_df(self):
+        """
+        :return: pandas DataFrame of counts indexed by bin centers
+        """
+        return pd.DataFrame(self.counts, index=pd.Index(self.centers, name='bin_center'))
+
+
+RASTER_REDUCTIONS = ['count', 'mean', 'max']
+
+
+def raster_grid(x, y, z=None, shape=(500, 500), reduction='count', x_range=None, y_range=None):
+    """
+    Aggregates (x, y) points into a regular 2D grid of cells with vectorized binning, so that the size of the result
+    only depends on the grid resolution. Points with a NaN coordinate (or NaN z value) and points outside of the ranges
+    are ignored.
+
+    :param x: numpy array of float x values
+    :type x: numpy array
+
+    :param y: numpy array of float y values
+    :type y: numpy array
+
+    :param z: numpy array of float values reduced in each cell. Required by 'mean' and 'max' reductions
+    :type z: numpy array, optional
+
+    :param shape: (number of columns along x, number of rows along y) of the grid
+    :type shape: tuple, optional
+
+    :param reduction: statistic of each cell. Possible choices are 'count' (number of points), 'mean' and 'max' (of z
+    values)
+    :type reduction: str, optional
+
+    :param x_range: (min, max) tuple of x values covered by the grid. Defaults to min and max of x
+    :type x_range: tuple, optional
+
+    :param y_range: (min, max) tuple of y values covered by the grid. Defaults to min and max of y
+    :type y_range: tuple, optional
+
+    :return: tuple (x_centers, y_centers, grid), grid being a numpy array of (rows, columns) shape whose empty cells
+    are NaN
+    """
+    if reduction not in RASTER_REDUCTIONS:
+        raise ValueError("Unknown raster reduction '{}'. Possible choices are : {}".format(
+            reduction, ', '.join(RASTER_REDUCTIONS)
+        ))
+    if reduction != 'count' and z is None:
+        raise ValueError("z values are required by '{}' raster reduction".format(reduction))
+
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if z is not None and reduction != 'count':
+        valid &= ~np.isnan(z)
+    x, y = x[valid], y[valid]
+    z = z[valid] if z is not None and reduction != 'count' else None
+
+    n_columns, n_rows = shape
+    x_edges = shared_bin_edges(pd.DataFrame({'x': x}), ['x'], n_columns, bin_range=x_range)
+    y_edges = shared_bin_edges(pd.DataFrame({'y': y}), ['y'], n_rows, bin_range=y_range)
+    columns = np.floor((x - x_edges[0]) / (x_edges[1] - x_edges[0])).astype(int)
+    rows = np.floor((y - y_edges[0]) / (y_edges[1] - y_edges[0])).astype(int)
+    # Maximal values belong to last cells
+    columns[x == x_edges[-1]] = n_columns - 1
+    rows[y == y_edges[-1]] = n_rows - 1
+    inside = (columns >= 0) & (columns < n_columns) & (rows >= 0) & (rows < n_rows)
+    cells = rows[inside] * n_columns + columns[inside]
+
+    counts = np.bincount(cells, minlength=n_rows * n_columns).astype(float)
+    if reduction == 'count':
+        grid = counts
+    elif reduction == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grid = np.bincount(cells, weights=z[inside], minlength=n_rows * n_columns) / counts
+    else:
+        grid = np.full(n_rows * n_columns, -np.inf)
+        np.maximum.at(grid, cells, z[inside])
+    grid[counts == 0] = np.nan
+    return (x_edges[:-1] + x_edges[1:]) / 2., (y_edges[:-1] + y_edges[1:]) / 2., grid.reshape(n_rows, n_columns)
@@ -0,0 +1,35 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Module proxy which imports the real module on first attribute access, so that heavy dependencies (numpy, pandas,
+    plotly, ...) are only loaded by ds_toolbox functions which actually use them.
+
+    :param name: absolute name of the module to import (ex: 'plotly.graph_objects')
+    :type name: str
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return "<lazy module '{}' ({})>".format(self._name, 'loaded' if self._module is not None else 'not loaded')
+
+
+def lazy_import(name):
+    """
+    Gets a lazily imported module.
+
+    :param name: absolute name of the module to import (ex: 'plotly.graph_objects')
+    :type name: str
+
+    :return: LazyModule proxy
+    """
+    return LazyModule(name)
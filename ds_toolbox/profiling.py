@@ -0,0 +1,199 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from ds_toolbox.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_collectors = []
+_call_ids = itertools.count(1)
+
+
+def is_enabled():
+    """
+    :return: True when a collector is active or profiling logger is at DEBUG level
+    """
+    return bool(_collectors) or logger.isEnabledFor(logging.DEBUG)
+
+
+def measures_payload():
+    """
+    :return: True when an active collector measures payloads (see profile_plots). Logging alone only records timings,
+    measuring a payload serializing the whole figure once more
+    """
+    return any(collector.payload for collector in _collectors)
+
+
+def _calls():
+    if not hasattr(_state, 'calls'):
+        _state.calls = []
+    return _state.calls
+
+
+def _emit(record):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            '%s %s: %.4f s %s', record['function'], record['stage'], record['seconds'],
+            ' '.join('{}={}'.format(name, value) for name, value in record.items()
+                     if name not in ['call', 'function', 'stage', 'seconds'])
+        )
+    for collector in list(_collectors):
+        collector.add(record)
+
+
+class _Stage:
+    """
+    Times a stage of current plotting call. Counters can be added to the yielded record dict within the stage.
+    """
+
+    def __init__(self, name, counters):
+        calls = _calls()
+        self.record = dict(
+            call=calls[0][0] if calls else None,
+            function=calls[-1][1] if calls else None,
+            stage=name,
+            **counters
+        )
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.record['seconds'] = time.perf_counter() - self.start
+        _emit(self.record)
+        return False
+
+
+class _NullStage:
+    """
+    Stage used when profiling is disabled: nothing is measured nor recorded.
+    """
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, **counters):
+    """
+    Context manager timing a stage of current plotting call when profiling is enabled.
+
+    :param name: stage name (ex: 'downsample', 'traces', 'layout', 'serialize', 'show')
+    :type name: str
+
+    :param counters: counters of the stage (ex: rows=len(df)). Counters only known at the end of the stage can be
+    added to the dict returned by the context manager
+
+    :return: context manager returning the record dict
+    """
+    return _Stage(name, counters) if is_enabled() else _NULL_STAGE
+
+
+def profiled(function):
+    """
+    Decorator recording a 'total' stage for each call of a plotting function. Stages of nested plotting calls (ex: plot
+    called by plot_evolution) share the call number of the outermost one.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return function(*args, **kwargs)
+        calls = _calls()
+        calls.append((calls[0][0] if calls else next(_call_ids), function.__name__))
+        try:
+            with stage('total'):
+                return function(*args, **kwargs)
+        finally:
+            calls.pop()
+    return wrapper
+
+
+def payload_bytes(figure):
+    """
+    :return: size in bytes of the JSON serialization of figure, as sent to the browser
+    """
+    return len(figure.to_json().encode('utf-8'))
+
+
+class ProfileCollector:
+    """
+    Collects profiling records of plotting calls.
+
+    :param callback: function called with each record dict as soon as it is recorded (ex: to push metrics to a
+    monitoring pipeline)
+    :type callback: callable, optional
+
+    :param payload: Boolean controlling whether or not to measure the JSON payload size of built figures, in a
+    'serialize' stage costing one more serialization of each figure
+    :type payload: bool, optional
+    """
+
+    def __init__(self, callback=None, payload=True):
+        self.callback = callback
+        self.payload = payload
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        """
+        Adds a record dict with 'call', 'function', 'stage', 'seconds' and counters keys.
+        """
+        with self._lock:
+            self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def to_df(self):
+        """
+        :return: pandas DataFrame of records, one row per stage
+        """
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        """
+        :return: pandas DataFrame of total seconds and number of records per function and stage
+        """
+        return self.to_df().groupby(['function', 'stage'])['seconds'].agg(['sum', 'count', 'max'])
+
+
+@contextmanager
+def profile_plots(callback=None, payload=True):
+    """
+    Context manager collecting profiling records of all plotting calls made within it. Plotting calls are split into
+    timed stages (reading, clipping, downsampling, traces, figure, layout, serialization, display...) with counters
+    (input rows, emitted points, payload bytes), ex:
+
+        with profile_plots() as collector:
+            graphs.plot_evolution(keys, df)
+        collector.summary()
+
+    Records are also logged when 'ds_toolbox.profiling' logger is at DEBUG level, which enables profiling without
+    collector. Payload sizes are then not measured, only timings. Nothing is measured otherwise.
+
+    :param callback: function called with each record dict (see ProfileCollector)
+    :type callback: callable, optional
+
+    :param payload: Boolean controlling whether or not to measure payload sizes (see ProfileCollector)
+    :type payload: bool, optional
+
+    :return: ProfileCollector
+    """
+    collector = ProfileCollector(callback=callback, payload=payload)
+    _collectors.append(collector)
+    try:
+        yield collector
+    finally:
+        _collectors.remove(collector)
@@ -0,0 +1,359 @@
+import json
+import logging
+import os
+
+from ds_toolbox.downsampling import bucket_aggregate, downsample_positions, to_numeric, to_numeric_bound
+from ds_toolbox.histograms import iter_chunks
+from ds_toolbox.lazy import lazy_import
+from ds_toolbox.sources import is_dataset, iter_dataset, read_dataset
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+PYRAMID_REDUCTIONS = ['minmax', 'mean']
+
+# Statistics stored for each bucket of each level, x_argmin and x_argmax being x values of extreme rows
+_STATISTICS = ['x_start', 'x_end', 'count', 'sum', 'min', 'max', 'argmin', 'argmax', 'x_argmin', 'x_argmax']
+
+# Levels are built until the coarsest one has less buckets than this
+_TOP_BUCKETS = 256
+
+
+def is_pyramid(data):
+    """
+    Checks whether data is a ds_toolbox.pyramid.Pyramid.
+
+    :param data: plotting functions input data
+    :type data: object
+
+    :return: bool
+    """
+    return isinstance(data, Pyramid)
+
+
+def _aggregate_rows(df, keys, offset, base):
+    """
+    Computes level 0 statistics of complete buckets of base rows of df, offset being the global position of its first
+    row.
+    """
+    x = to_numeric(df.index)
+    aggregate = bucket_aggregate(df[keys].to_numpy(dtype=float), np.arange(len(df)) // base)
+    starts = np.arange(0, len(df), base)
+    aggregate['x_start'] = x[starts]
+    aggregate['x_end'] = x[np.minimum(starts + base, len(df)) - 1]
+    aggregate['x_argmin'] = x[aggregate['argmin']]
+    aggregate['x_argmax'] = x[aggregate['argmax']]
+    aggregate['argmin'] = offset + aggregate['argmin']
+    aggregate['argmax'] = offset + aggregate['argmax']
+    return {name: aggregate[name] for name in _STATISTICS}
+
+
+def _merge_level(level, factor):
+    """
+    Computes statistics of a coarser level whose buckets are made of factor consecutive buckets of level.
+    """
+    n_buckets = len(level['x_start'])
+    n_groups = -(-n_buckets // factor)
+    padding = n_groups * factor - n_buckets
+
+    def grouped(name, fill_value):
+        values = level[name]
+        if padding > 0:
+            values = np.concatenate([values, np.full((padding,) + values.shape[1:], fill_value, dtype=values.dtype)])
+        return values.reshape((n_groups, factor) + values.shape[1:])
+
+    merged = dict(
+        x_start=grouped('x_start', np.nan)[:, 0],
+        x_end=np.fmax.reduce(grouped('x_end', np.nan), axis=1),
+        count=grouped('count', 0).sum(axis=1),
+        sum=grouped('sum', 0).sum(axis=1),
+    )
+    for name, fill_value in [('min', np.inf), ('max', -np.inf)]:
+        values = grouped(name, np.nan)
+        values = np.where(np.isnan(values), fill_value, values)
+        # Child bucket holding the extreme, the first child when all values are NaN
+        child = (np.argmin if name == 'min' else np.argmax)(values, axis=1)[:, None, :]
+        extremes = np.take_along_axis(values, child, axis=1)[:, 0, :]
+        merged[name] = np.where(np.isinf(extremes), np.nan, extremes)
+        merged['arg' + name] = np.take_along_axis(grouped('arg' + name, 0), child, axis=1)[:, 0, :]
+        merged['x_arg' + name] = np.take_along_axis(grouped('x_arg' + name, np.nan), child, axis=1)[:, 0, :]
+    return merged
+
+
+def build_pyramid(data, keys, path=None, base=256, factor=4, index_name=None, batch_size=2 ** 20):
+    """
+    Precomputes once a multi-resolution pyramid of count, sum, minimal and maximal values of keys and persists it on
+    disk, so that any window of a long series can later be reduced to a few thousand points by reading O(pixels)
+    buckets (see Pyramid.query) instead of scanning all its rows.
+    Level 0 buckets are made of base consecutive rows, each level buckets being made of factor buckets of the previous
+    level, until the coarsest level has less than 256 buckets. Data is read in one pass, chunk after chunk, so only
+    level 0 statistics (len(data) / base buckets) are held in memory.
+
+    :param data: pandas DataFrame indexed by dates or numbers, iterable of such DataFrames (consecutive chunks of a
+    sorted series), or Parquet file/directory path or pyarrow dataset read batch after batch
+    :type data: pandas DataFrame, iterable, str or pyarrow.dataset.Dataset
+
+    :param keys: list of quantities names corresponding to data columns names
+    :type keys: list
+
+    :param path: directory where the pyramid is written, one .npy file per level statistic. Defaults to data path
+    followed by '.pyramid' for a Parquet path
+    :type path: str, optional
+
+    :param base: number of rows of level 0 buckets
+    :type base: int, optional
+
+    :param factor: number of buckets of a level merged in one bucket of the next level
+    :type factor: int, optional
+
+    :param index_name: name of the column used as index when data is a Parquet path or pyarrow dataset
+    :type index_name: str, optional
+
+    :param batch_size: number of rows of the batches read from a Parquet path or pyarrow dataset
+    :type batch_size: int, optional
+
+    :return: Pyramid
+    """
+    source = None
+    if is_dataset(data):
+        if isinstance(data, (str, os.PathLike)):
+            source = os.fspath(data)
+            path = path if path is not None else source.rstrip('/' + os.sep) + '.pyramid'
+        chunks = iter_dataset(data, columns=list(keys), index_name=index_name, batch_size=batch_size)
+    else:
+        chunks = iter_chunks(data)
+    if path is None:
+        raise ValueError('path is required to build a pyramid which is not read from a Parquet path')
+    os.makedirs(path, exist_ok=True)
+
+    parts = []
+    remainder = None
+    offset = 0
+    x_dtype = None
+    for chunk in chunks:
+        x_dtype = str(chunk.index.dtype)
+        chunk = chunk if remainder is None else pd.concat([remainder, chunk])
+        complete = len(chunk) // base * base
+        if complete > 0:
+            parts.append(_aggregate_rows(chunk.iloc[:complete], keys, offset, base))
+        remainder = chunk.iloc[complete:]
+        offset += complete
+    if remainder is not None and len(remainder) > 0:
+        parts.append(_aggregate_rows(remainder, keys, offset, base))
+        offset += len(remainder)
+    if len(parts) == 0:
+        raise ValueError('Can not build a pyramid of empty data')
+
+    level = {name: np.concatenate([part[name] for part in parts]) for name in _STATISTICS}
+    levels = []
+    bucket_size = base
+    while True:
+        for name in _STATISTICS:
+            np.save(os.path.join(path, 'level_{}_{}.npy'.format(len(levels), name)), level[name])
+        levels.append(dict(bucket_size=bucket_size, n_buckets=len(level['x_start'])))
+        if len(level['x_start']) < _TOP_BUCKETS:
+            break
+        level = _merge_level(level, factor)
+        bucket_size *= factor
+
+    with open(os.path.join(path, 'pyramid.json'), 'w') as meta_file:
+        json.dump(dict(
+            keys=list(keys), n_rows=offset, base=base, factor=factor, levels=levels, x_dtype=x_dtype,
+            source=source, index_name=index_name
+        ), meta_file, indent=2)
+    logger.debug('Built pyramid of %s rows with %s levels in %s', offset, len(levels), path)
+    return Pyramid(path)
+
+
+class Pyramid:
+    """
+    Multi-resolution pyramid of statistics of a long series, written by build_pyramid. Levels statistics are memory
+    mapped, so that a query only reads the buckets of the requested window from disk.
+
+    :param path: directory where the pyramid was written
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, 'pyramid.json'), 'r') as meta_file:
+            meta = json.load(meta_file)
+        self.keys = meta['keys']
+        self.n_rows = meta['n_rows']
+        self.levels = meta['levels']
+        self.source = meta['source']
+        self.index_name = meta['index_name']
+        # Empty index of the original x dtype, used to convert bounds and x values
+        self._x = pd.Index([], dtype=meta['x_dtype'])
+        self._arrays = {}
+
+    def array(self, level, name):
+        """
+        :return: memory mapped numpy array of a statistic of a level
+        """
+        if (level, name) not in self._arrays:
+            self._arrays[(level, name)] = np.load(
+                os.path.join(self.path, 'level_{}_{}.npy'.format(level, name)), mmap_mode='r'
+            )
+        return self._arrays[(level, name)]
+
+    def window(self, level, low=None, high=None):
+        """
+        Finds with binary search the buckets of a level overlapping [low, high], plus one bucket on each side so that
+        lines reach the borders of the window.
+
+        :param level: level number
+        :type level: int
+
+        :param low: minimal numeric x value (see ds_toolbox.downsampling.to_numeric_bound), None for no lower bound
+        :type low: float, optional
+
+        :param high: maximal numeric x value, None for no upper bound
+        :type high: float, optional
+
+        :return: tuple (start, end) of buckets positions
+        """
+        x_start = self.array(level, 'x_start')
+        start = int(x_start.searchsorted(low, side='right')) - 2 if low is not None else 0
+        end = int(x_start.searchsorted(high, side='right')) + 1 if high is not None else len(x_start)
+        return max(start, 0), min(end, len(x_start))
+
+    def query(self, keys=None, x_min=None, x_max=None, n_out=1000, method='minmax'):
+        """
+        Reduces the [x_min, x_max] window to about n_out points per key (see query_series), points of all keys being
+        gathered in one DataFrame indexed by the union of their x values. With 'minmax' and several keys, a key is NaN
+        at x values of other keys points: values are never interpolated.
+
+        :param keys: list of quantities names. Defaults to all keys of the pyramid
+        :type keys: list, optional
+
+        :param x_min: minimal x value of the window
+        :type x_min: float or string date, optional
+
+        :param x_max: maximal x value of the window
+        :type x_max: float or string date, optional
+
+        :param n_out: target number of points per key
+        :type n_out: int, optional
+
+        :param method: reduction algorithm (see query_series)
+        :type method: str, optional
+
+        :return: pandas DataFrame of reduced points indexed by x values
+        """
+        keys = keys if keys is not None else self.keys
+        series = self.query_series(keys, x_min=x_min, x_max=x_max, n_out=n_out, method=method)
+        return pd.concat([series[key] for key in keys], axis=1, keys=keys).sort_index()
+
+    def query_series(self, keys=None, x_min=None, x_max=None, n_out=1000, method='minmax'):
+        """
+        Reduces the [x_min, x_max] window to about n_out points per key, reading only the buckets of the coarsest
+        level which still has enough buckets in the window. When even level 0 is too coarse for the window and the
+        pyramid was built from a Parquet path, raw rows of the window are read and downsampled instead. Otherwise (ex:
+        pyramid built from a DataFrame), the window is only reduced to its few level 0 buckets, each holding base rows,
+        and a warning is logged: build the pyramid with a smaller base to zoom further.
+
+        :param keys: list of quantities names. Defaults to all keys of the pyramid
+        :type keys: list, optional
+
+        :param x_min: minimal x value of the window
+        :type x_min: float or string date, optional
+
+        :param x_max: maximal x value of the window
+        :type x_max: float or string date, optional
+
+        :param n_out: target number of points per key
+        :type n_out: int, optional
+
+        :param method: reduction algorithm. Possible choices are 'minmax' (minimal and maximal values of each bucket,
+        in their original order, at the x values of their rows, each key having its own x values) and 'mean' (mean
+        value of each bucket, at bucket middle)
+        :type method: str, optional
+
+        :return: dict of pandas Series of reduced points of each key, indexed by x values. A bucket without valid
+        values is a NaN point, so that lines are broken there
+        """
+        if method not in PYRAMID_REDUCTIONS:
+            raise ValueError("Unknown pyramid reduction '{}'. Possible choices are : {}".format(
+                method, ', '.join(PYRAMID_REDUCTIONS)
+            ))
+        keys = keys if keys is not None else self.keys
+        columns = [self.keys.index(key) for key in keys]
+        low = to_numeric_bound(self._x, x_min) if x_min is not None else None
+        high = to_numeric_bound(self._x, x_max) if x_max is not None else None
+        n_buckets = max(n_out // 2, 1) if method == 'minmax' else max(n_out, 1)
+
+        level = 0
+        for candidate in reversed(range(len(self.levels))):
+            start, end = self.window(candidate, low, high)
+            if end - start >= n_buckets:
+                level = candidate
+                break
+        start, end = self.window(level, low, high)
+        if level == 0 and end - start < n_buckets:
+            if self.source is not None:
+                df = self._query_source(keys, x_min, x_max, n_out, method)
+                return {key: df[key] for key in keys}
+            logger.warning(
+                'Window only covers %s level 0 buckets of %s rows and pyramid has no Parquet source to read raw rows '
+                'from, %s points are returned instead of %s', end - start, self.levels[0]['bucket_size'],
+                (end - start) * (2 if method == 'minmax' else 1), n_out
+            )
+        logger.debug('Reading %s buckets of pyramid level %s', end - start, level)
+
+        statistics = {
+            name: np.asarray(self.array(level, name)[start:end])
+            for name in _STATISTICS
+        }
+        # Other statistics are stored per key
+        for name in _STATISTICS[2:]:
+            statistics[name] = statistics[name][:, columns]
+        if end - start > n_buckets:
+            # Levels being factor times coarser than each other, read buckets are merged to about n_buckets
+            statistics = _merge_level(statistics, -(-(end - start) // n_buckets))
+        if method == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = statistics['sum'] / statistics['count']
+            x = self._to_x((statistics['x_start'] + statistics['x_end']) / 2.)
+            return {key: pd.Series(values[:, column], index=x, name=key) for column, key in enumerate(keys)}
+
+        # Extremes of each bucket in the order of their rows, at their x values, a row holding both extremes (or no
+        # valid value) being kept once
+        min_first = statistics['argmin'] <= statistics['argmax']
+        pairs = [
+            [np.where(min_first, statistics[first], statistics[second]),
+             np.where(min_first, statistics[second], statistics[first])]
+            for first, second in [('min', 'max'), ('x_argmin', 'x_argmax')]
+        ]
+        values, xs = [np.stack(pair, axis=1) for pair in pairs]
+        distinct = np.stack([np.full(min_first.shape, True), statistics['argmin'] != statistics['argmax']], axis=1)
+        return {
+            key: pd.Series(
+                values[:, :, column][distinct[:, :, column]],
+                index=self._to_x(xs[:, :, column][distinct[:, :, column]]),
+                name=key
+            )
+            for column, key in enumerate(keys)
+        }
+
+    def _query_source(self, keys, x_min, x_max, n_out, method):
+        """
+        Reads raw rows of a window from the Parquet source of the pyramid and downsamples them.
+        """
+        df = read_dataset(self.source, columns=list(keys), index_name=self.index_name, x_min=x_min, x_max=x_max)
+        logger.debug('Reading %s raw rows of pyramid source', len(df))
+        positions = downsample_positions(
+            x=df.index, ys=[df[key] for key in keys], n_out=n_out, method='minmax' if method == 'minmax' else 'stride'
+        )
+        return df.iloc[positions]
+
+    def _to_x(self, values):
+        """
+        Converts numeric x values back to the x dtype of the pyramid data.
+        """
+        if pd.api.types.is_datetime64_any_dtype(self._x):
+            dates = pd.to_datetime(values.astype('int64'), utc=getattr(self._x.dtype, 'tz', None) is not None)
+            return dates.tz_convert(self._x.dtype.tz) if dates.tz is not None else dates
+        return pd.Index(values)
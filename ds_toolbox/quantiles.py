@@ -0,0 +1,132 @@
+import logging
+from math import ceil
+
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+
+def exact_quantiles(values, quantiles):
+    """
+    Computes all requested quantiles of values in one vectorized pass (NaN values are ignored).
+
+    :param values: array-like of float values
+    :type values: array-like
+
+    :param quantiles: list of float values between 0 and 1
+    :type quantiles: list
+
+    :return: numpy array of quantile values, empty if values contains no valid value
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0 or len(quantiles) == 0:
+        return np.array([])
+    return np.quantile(values, quantiles)
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (KLL: Karnin, Lang, Liberty, 2016). Values are added by chunks and stored in a hierarchy
+    of compactors, level h items having a weight of 2 ** h. When a compactor exceeds its capacity, it is sorted and one
+    item out of two is promoted to the next level. Memory is O(k log(n / k)) and rank error is about 1.7 / k.
+
+    :param k: size of the largest compactor, controlling accuracy
+    :type k: int, optional
+
+    :param seed: seed of the random generator used to choose promoted items
+    :type seed: int, optional
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(ceil(self.k * (2. / 3.) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(self.compactors[level])
+                # An odd item stays at current level so that total weight is preserved
+                kept = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+                self.compactors[level] = kept
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+                # Capacities depend on the number of levels: check again from the bottom
+                level = 0
+            else:
+                level += 1
+
+    def update(self, values):
+        """
+        Adds a chunk of values (NaN values are ignored).
+
+        :param values: array-like of float values
+        :type values: array-like
+
+        :return: the sketch itself
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Merges another sketch (for example built on another partition of the data) into this one.
+
+        :param other: sketch to merge
+        :type other: KLLSketch
+
+        :return: the sketch itself
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, quantiles):
+        """
+        Estimates requested quantiles.
+
+        :param quantiles: list of float values between 0 and 1
+        :type quantiles: list
+
+        :return: numpy array of quantile values, empty if no value was added
+        """
+        if self.count == 0 or len(quantiles) == 0:
+            return np.array([])
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([
+            np.full(len(level_items), 2. ** level) for level, level_items in enumerate(self.compactors)
+        ])
+        order = np.argsort(items)
+        items, cumulated_weights = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulated_weights, np.asarray(quantiles) * cumulated_weights[-1], side='left')
+        values = items[np.minimum(positions, len(items) - 1)]
+        values[np.asarray(quantiles) <= 0] = self.min
+        values[np.asarray(quantiles) >= 1] = self.max
+        return values
@@ -0,0 +1,379 @@
+import io
+import logging
+
+from ds_toolbox.downsampling import to_numeric
+from ds_toolbox.lazy import lazy_import
+
+backend_agg = lazy_import('matplotlib.backends.backend_agg')
+mcolors = lazy_import('matplotlib.colors')
+mdates = lazy_import('matplotlib.dates')
+mfigure = lazy_import('matplotlib.figure')
+mpatches = lazy_import('matplotlib.patches')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+RASTER_LAYERS = ['lines', 'points', 'band', 'bars', 'vline']
+
+# plotly default colorway, so that raster images use the same colors as interactive figures
+COLORWAY = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A', '#19d3f3', '#FF6692', '#B6E880', '#FF97FF',
+            '#FECB52']
+
+# (paper color, plot area color, grid color, text color) of templates
+_THEMES = {
+    'dark': ('#111111', '#111111', '#283442', '#f2f5fa'),
+    'light': ('#ffffff', '#e5ecf6', '#ffffff', '#2a3f5f'),
+}
+
+# Plot area margins in pixels, so that layers are aggregated to the exact pixels of the image
+_MARGINS = dict(left=90, right=20, top=50, bottom=60)
+
+_DPI = 100
+
+
+def parse_color(color):
+    """
+    Converts a plotly color string to a RGBA tuple.
+
+    :param color: 'rgb(r, g, b)' or 'rgba(r, g, b, a)' string, or any matplotlib color (hexadecimal string, name...)
+    :type color: str
+
+    :return: tuple (red, green, blue, alpha) of values between 0 and 1
+    """
+    color = color.strip()
+    if color.startswith('rgb'):
+        values = [float(value) for value in color[color.index('(') + 1:color.index(')')].split(',')]
+        return values[0] / 255., values[1] / 255., values[2] / 255., values[3] if len(values) == 4 else 1.
+    return mcolors.to_rgba(color)
+
+
+def raster_x(values):
+    """
+    Converts x values to the float scale of raster layers. Dates are converted to nanoseconds since epoch of their
+    wall time, as plotly displays them.
+
+    :param values: array-like x values (numbers, dates or pandas index)
+    :type values: array-like
+
+    :return: tuple (numpy array of float values, Boolean indicating whether values are dates)
+    """
+    is_date = pd.api.types.is_datetime64_any_dtype(values)
+    if is_date and getattr(values.dtype, 'tz', None) is not None:
+        values = pd.DatetimeIndex(values).tz_localize(None)
+    return to_numeric(values), is_date
+
+
+def raster_bound(value, is_date=False):
+    """
+    Converts an x range bound (number, date or string date) to the float scale of raster layers (see raster_x).
+
+    :param value: bound value, None for no bound
+    :type value: float, str or date
+
+    :param is_date: Boolean indicating whether x values are dates
+    :type is_date: bool, optional
+
+    :return: float value, None if value is None
+    """
+    if value is None:
+        return None
+    if is_date:
+        value = pd.Timestamp(value)
+        value = value.tz_localize(None) if value.tz is not None else value
+        return float(value.as_unit('ns').value)
+    return float(value)
+
+
+def _paint_spans(mask, columns, low, high):
+    """
+    Sets mask pixels of vertical spans going from row low to row high (included) of columns.
+    """
+    height, width = mask.shape
+    keep = (columns >= 0) & (columns < width) & (high >= 0) & (low < height)
+    columns = columns[keep]
+    low = np.clip(low[keep], 0, height - 1)
+    high = np.clip(high[keep], 0, height - 1)
+    lengths = high - low + 1
+    if lengths.sum() == 0:
+        return
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = np.repeat(low, lengths) + np.arange(lengths.sum()) - starts
+    mask[rows, np.repeat(columns, lengths)] = True
+
+
+def line_mask(columns, rows, shape):
+    """
+    Rasterizes a line going through points sorted by column with direct pixel aggregation: points of each pixel column
+    are reduced to one vertical span (minimal and maximal rows), consecutive columns being joined by straight segments.
+    Cost is linear in the number of points, drawing only depends on the image size. NaN rows break the line.
+
+    :param columns: numpy array of float pixel columns of points, sorted
+    :type columns: numpy array
+
+    :param rows: numpy array of float pixel rows of points
+    :type rows: numpy array
+
+    :param shape: (height, width) of the mask
+    :type shape: tuple
+
+    :return: numpy array of bool values of shape shape
+    """
+    mask = np.zeros(shape, dtype=bool)
+    valid = ~(np.isnan(columns) | np.isnan(rows))
+    if not valid.any():
+        return mask
+    segments = np.cumsum(~valid)[valid]
+    # Points far outside of the image are moved to its border, so that joining segments stay short
+    columns = np.clip(np.floor(columns[valid]), -1, shape[1]).astype(int)
+    rows = rows[valid]
+
+    starts = np.flatnonzero(np.r_[True, (columns[1:] != columns[:-1]) | (segments[1:] != segments[:-1])])
+    ends = np.r_[starts[1:], len(columns)]
+    run_columns = columns[starts]
+    spans_columns = [run_columns]
+    spans_low = [np.fmin.reduceat(rows, starts)]
+    spans_high = [np.fmax.reduceat(rows, starts)]
+
+    # Segments joining last point of a run to first point of next run of the same line part
+    joined = np.flatnonzero(segments[starts[1:]] == segments[starts[:-1]])
+    if len(joined) > 0:
+        column_a, column_b = run_columns[joined] + 0.5, run_columns[joined + 1] + 0.5
+        row_a, row_b = rows[ends[joined] - 1], rows[starts[joined + 1]]
+        lengths = run_columns[joined + 1] - run_columns[joined] + 1
+        segment = np.repeat(np.arange(len(joined)), lengths)
+        column = np.repeat(run_columns[joined], lengths) + np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        slope = (row_b - row_a) / (column_b - column_a)
+        u_low = np.maximum(column, column_a[segment])
+        u_high = np.minimum(column + 1, column_b[segment])
+        rows_low = row_a[segment] + slope[segment] * (u_low - column_a[segment])
+        rows_high = row_a[segment] + slope[segment] * (u_high - column_a[segment])
+        spans_columns.append(column)
+        spans_low.append(np.minimum(rows_low, rows_high))
+        spans_high.append(np.maximum(rows_low, rows_high))
+
+    _paint_spans(
+        mask,
+        np.concatenate(spans_columns),
+        np.floor(np.concatenate(spans_low)).astype(int),
+        np.floor(np.concatenate(spans_high)).astype(int)
+    )
+    return mask
+
+
+def points_mask(columns, rows, shape):
+    """
+    Rasterizes points: pixels containing at least one point are set.
+
+    :return: numpy array of bool values of shape shape
+    """
+    mask = np.zeros(shape, dtype=bool)
+    valid = ~(np.isnan(columns) | np.isnan(rows))
+    columns, rows = np.floor(columns[valid]).astype(int), np.floor(rows[valid]).astype(int)
+    inside = (columns >= 0) & (columns < shape[1]) & (rows >= 0) & (rows < shape[0])
+    mask[rows[inside], columns[inside]] = True
+    return mask
+
+
+def band_mask(columns, rows_up, rows_down, shape):
+    """
+    Rasterizes the area between two bounds sorted by column: the band covers, in each pixel column, the extreme bounds
+    of its points, columns without points being interpolated.
+
+    :return: numpy array of bool values of shape shape
+    """
+    mask = np.zeros(shape, dtype=bool)
+    valid = ~(np.isnan(columns) | np.isnan(rows_up) | np.isnan(rows_down))
+    if not valid.any():
+        return mask
+    columns = np.clip(np.floor(columns[valid]), -1, shape[1]).astype(int)
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    run_columns = columns[starts]
+    up = np.fmin.reduceat(rows_up[valid], starts)
+    down = np.fmax.reduceat(rows_down[valid], starts)
+    all_columns = np.arange(run_columns[0], run_columns[-1] + 1)
+    up, down = np.interp(all_columns, run_columns, up), np.interp(all_columns, run_columns, down)
+    _paint_spans(mask, all_columns, np.floor(np.minimum(up, down)).astype(int),
+                 np.floor(np.maximum(up, down)).astype(int))
+    return mask
+
+
+def _dilate(mask, size):
+    """
+    Thickens mask pixels to size x size squares.
+    """
+    dilated = mask.copy()
+    for shift in range(1, size):
+        dilated[:, shift:] |= mask[:, :-shift]
+    rows = dilated.copy()
+    for shift in range(1, size):
+        dilated[shift:] |= rows[:-shift]
+    return dilated
+
+
+def _data_range(layers, names, x_range=None):
+    """
+    Gets minimal and maximal finite values of some arrays of layers, only keeping values whose x is within x_range
+    (low, high) tuple if given.
+    """
+    values = []
+    for layer in layers:
+        inside = None
+        if x_range is not None and np.ndim(layer['x']) > 0:
+            x_values = np.asarray(layer['x'], dtype=float)
+            inside = (x_values >= x_range[0]) & (x_values <= x_range[1])
+        for name in names:
+            if layer.get(name) is None:
+                continue
+            value = np.asarray(layer[name], dtype=float)
+            value = value[inside] if inside is not None and value.shape == inside.shape else value
+            values.append(value[np.isfinite(value)])
+    values = [value for value in values if len(value) > 0]
+    if len(values) == 0:
+        return 0., 1.
+    return min(value.min() for value in values), max(value.max() for value in values)
+
+
+def layer_mask(layer, to_columns, to_rows, shape):
+    """
+    Aggregates a 'lines', 'points' or 'band' layer to the pixels of the plot area.
+
+    :return: numpy array of bool values of shape shape
+    """
+    if layer['type'] == 'lines':
+        return _dilate(line_mask(to_columns(layer['x']), to_rows(layer['y']), shape), 2)
+    if layer['type'] == 'points':
+        return _dilate(points_mask(to_columns(layer['x']), to_rows(layer['y']), shape), 3)
+    return band_mask(to_columns(layer['x']), to_rows(layer['up']), to_rows(layer['down']), shape)
+
+
+def render_png(layers, width=1200, height=600, x_range=None, y_range=None, is_date=False, title=None,
+               x_axis_name=None, y_axis_name=None, template='plotly_dark'):
+    """
+    Renders layers of numpy arrays to a PNG image without building any plotly figure nor JSON: lines, points and bands
+    layers are aggregated to the pixels of the plot area (see line_mask, points_mask and band_mask), whatever their
+    number of points, and drawn as images on a matplotlib Agg figure, which also draws bars, vertical lines, axes,
+    ticks, title and legend.
+
+    :param layers: list of layer dicts with a 'type' item among RASTER_LAYERS and :
+    - 'lines' and 'points': 'x' and 'y' float numpy arrays ('x' being sorted for lines), 'color' and optional 'name'
+    (shown in legend) items
+    - 'band': 'x', 'up' and 'down' float numpy arrays and 'color' items
+    - 'bars': 'x' (centers), 'width', 'y' (tops) and optional 'base' (bottoms) float numpy arrays and 'color' items
+    - 'vline': 'x' float value and 'color' items
+    :type layers: list
+
+    :param width: image width in pixels
+    :type width: int, optional
+
+    :param height: image height in pixels
+    :type height: int, optional
+
+    :param x_range: (min, max) tuple of x values shown, None values being taken from data
+    :type x_range: tuple, optional
+
+    :param y_range: (min, max) tuple of y values shown, None values being taken from data
+    :type y_range: tuple, optional
+
+    :param is_date: Boolean indicating whether x values are dates in nanoseconds since epoch (see raster_x)
+    :type is_date: bool, optional
+
+    :param title: title of the image
+    :type title: str, optional
+
+    :param x_axis_name: name of x axis
+    :type x_axis_name: str, optional
+
+    :param y_axis_name: name of y axis
+    :type y_axis_name: str, optional
+
+    :param template: plotly template name, 'plotly_dark' being rendered with dark colors and others with light ones
+    :type template: str, optional
+
+    :return: PNG bytes
+    """
+    for layer in layers:
+        if layer['type'] not in RASTER_LAYERS:
+            raise ValueError("Unknown raster layer '{}'. Possible choices are : {}".format(
+                layer['type'], ', '.join(RASTER_LAYERS)
+            ))
+    paper, plot_area, grid, text = _THEMES['dark' if template == 'plotly_dark' else 'light']
+    x_range = tuple(x_range) if x_range is not None else (None, None)
+    y_range = tuple(y_range) if y_range is not None else (None, None)
+    data_x = _data_range(layers, ['x'])
+    x_low = x_range[0] if x_range[0] is not None else data_x[0]
+    x_high = x_range[1] if x_range[1] is not None else data_x[1]
+    data_y = _data_range(layers, ['y', 'up', 'down', 'base'], x_range=(x_low, x_high))
+    padding = (data_y[1] - data_y[0]) * 0.05 or 1.
+    y_low = y_range[0] if y_range[0] is not None else data_y[0] - padding
+    y_high = y_range[1] if y_range[1] is not None else data_y[1] + padding
+    x_high = x_high if x_high > x_low else x_low + 1.
+    y_high = y_high if y_high > y_low else y_low + 1.
+    shape = (height - _MARGINS['top'] - _MARGINS['bottom'], width - _MARGINS['left'] - _MARGINS['right'])
+
+    def to_columns(values):
+        return (np.asarray(values, dtype=float) - x_low) / (x_high - x_low) * shape[1]
+
+    def to_rows(values):
+        return (y_high - np.asarray(values, dtype=float)) / (y_high - y_low) * shape[0]
+
+    # Matplotlib dates are days since its epoch
+    x_offset = mdates.date2num(np.datetime64(0, 'ns')) if is_date else 0.
+    x_scale = 1. / 86400e9 if is_date else 1.
+
+    def to_axis(values):
+        return np.asarray(values, dtype=float) * x_scale + x_offset
+
+    figure = mfigure.Figure(figsize=(width / _DPI, height / _DPI), dpi=_DPI, facecolor=paper)
+    backend_agg.FigureCanvasAgg(figure)
+    axes = figure.add_axes([
+        _MARGINS['left'] / width, _MARGINS['bottom'] / height, shape[1] / width, shape[0] / height
+    ], facecolor=plot_area)
+    extent = (to_axis(x_low), to_axis(x_high), y_low, y_high)
+
+    legend = []
+    for zorder, layer in enumerate(layers, start=2):
+        color = parse_color(layer['color'])
+        if layer['type'] == 'vline':
+            axes.axvline(to_axis(layer['x']), color=color, linestyle=':', linewidth=1, zorder=zorder)
+        elif layer['type'] == 'bars':
+            base = np.asarray(layer['base'], dtype=float) if layer.get('base') is not None else 0.
+            axes.bar(to_axis(layer['x']), np.asarray(layer['y'], dtype=float) - base,
+                     width=np.asarray(layer['width'], dtype=float) * x_scale, bottom=base, color=color, linewidth=0,
+                     zorder=zorder)
+        else:
+            image = np.zeros(shape + (4,))
+            image[layer_mask(layer, to_columns, to_rows, shape)] = color
+            axes.imshow(image, extent=extent, origin='upper', aspect='auto', interpolation='nearest', zorder=zorder)
+        if layer.get('name') is not None:
+            legend.append(mpatches.Patch(color=color, label=str(layer['name'])))
+
+    axes.set_xlim(extent[0], extent[1])
+    axes.set_ylim(y_low, y_high)
+    axes.set_axisbelow(True)
+    axes.grid(True, color=grid, linewidth=1)
+    axes.tick_params(colors=text, length=0, pad=6)
+    for spine in axes.spines.values():
+        spine.set_visible(False)
+    if is_date:
+        locator = mdates.AutoDateLocator()
+        axes.xaxis.set_major_locator(locator)
+        axes.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        axes.xaxis.get_offset_text().set_color(text)
+    axes.ticklabel_format(axis='both' if not is_date else 'y', useOffset=False)
+    if x_axis_name:
+        axes.set_xlabel(str(x_axis_name), color=text)
+    if y_axis_name:
+        axes.set_ylabel(str(y_axis_name), color=text, loc='top')
+    if title:
+        axes.set_title(str(title), color=text, loc='left', fontsize=14, pad=12)
+    if legend:
+        axes.legend(handles=legend, loc='lower right', bbox_to_anchor=(1., 1.), ncol=len(legend), frameon=False,
+                    labelcolor=text, handlelength=1, borderaxespad=0.2)
+
+    png = io.BytesIO()
+    figure.savefig(png, format='png', facecolor=paper, metadata={'Title': str(title)} if title else None)
+    logger.debug('Rendered %s layers to a %sx%s image', len(layers), width, height)
+    return png.getvalue()
@@ -0,0 +1,140 @@
+import logging
+import os
+
+from ds_toolbox.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def is_dataset(data):
+    """
+    Checks whether data is a Parquet path or a pyarrow dataset rather than an in-memory pandas DataFrame.
+
+    :param data: plotting functions input data
+    :type data: object
+
+    :return: bool
+    """
+    return isinstance(data, (str, os.PathLike)) or type(data).__module__.startswith('pyarrow')
+
+
+def dataset_index_name(dataset):
+    """
+    Gets name of the column storing pandas index of a dataset written from pandas (ex: with DataFrame.to_parquet).
+
+    :param dataset: pyarrow dataset
+    :type dataset: pyarrow.dataset.Dataset
+
+    :return: column name, None if index was not stored as a column (ex: RangeIndex)
+    """
+    metadata = dataset.schema.pandas_metadata or {}
+    index_columns = [column for column in metadata.get('index_columns', []) if isinstance(column, str)]
+    return index_columns[0] if len(index_columns) == 1 else None
+
+
+def _bound_scalar(value, field):
+    """
+    Converts an x_min / x_max value (number, date or string date) to a pyarrow scalar comparable to field.
+    """
+    import pyarrow as pa
+
+    if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+        value = pd.Timestamp(value)
+        timezone = getattr(field.type, 'tz', None)
+        if timezone is not None and value.tz is None:
+            value = value.tz_localize(timezone)
+        elif timezone is None and value.tz is not None:
+            value = value.tz_convert(None)
+        if pa.types.is_date(field.type):
+            value = value.date()
+    return pa.scalar(value, type=field.type)
+
+
+def read_dataset(source, columns, index_name=None, filter_name=None, x_min=None, x_max=None):
+    """
+    Reads only some columns of a Parquet file/directory or pyarrow dataset, pushing optional range filters down to the
+    Parquet reader so that only matching row groups are loaded.
+
+    :param source: Parquet file or directory path, or pyarrow dataset
+    :type source: str or pyarrow.dataset.Dataset
+
+    :param columns: list of columns names to read
+    :type columns: list
+
+    :param index_name: name of the column to use as index. Defaults to pandas index stored in dataset metadata
+    :type index_name: str, optional
+
+    :param filter_name: name of the column filtered with x_min and x_max. Defaults to index column
+    :type filter_name: str, optional
+
+    :param x_min: minimal value of filter_name column to read
+    :type x_min: float or string date, optional
+
+    :param x_max: maximal value of filter_name column to read
+    :type x_max: float or string date, optional
+
+    :return: pandas DataFrame of requested columns indexed by index column
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(source, format='parquet') if isinstance(source, (str, os.PathLike)) else source
+    index_name = index_name if index_name is not None else dataset_index_name(dataset)
+    filter_name = filter_name if filter_name is not None else index_name
+
+    expression = None
+    if filter_name is not None:
+        field = dataset.schema.field(filter_name)
+        for bound, comparison in [(x_min, '__ge__'), (x_max, '__le__')]:
+            if bound is None:
+                continue
+            condition = getattr(ds.field(filter_name), comparison)(_bound_scalar(bound, field))
+            expression = condition if expression is None else expression & condition
+
+    read_columns = list(dict.fromkeys(columns + ([index_name] if index_name is not None else [])))
+    table = dataset.to_table(columns=read_columns, filter=expression)
+    logger.debug('Read %s rows of %s columns from dataset with filter %s', table.num_rows, read_columns, expression)
+    return _to_df(table, index_name)
+
+
+def _to_df(table, index_name):
+    """
+    Converts a pyarrow table or record batch to a pandas DataFrame indexed by index_name column.
+    """
+    df = table.to_pandas()
+    # pyarrow restores pandas index by itself when index column is read and dataset has pandas metadata
+    if index_name is not None and index_name in df.columns:
+        df = df.set_index(index_name)
+    if str(df.index.name).startswith('__index_level_'):
+        df.index.name = None
+    return df
+
+
+def iter_dataset(source, columns, index_name=None, batch_size=2 ** 20):
+    """
+    Reads some columns of a Parquet file/directory or pyarrow dataset batch after batch, so that datasets larger than
+    memory can be processed in one pass.
+
+    :param source: Parquet file or directory path, or pyarrow dataset
+    :type source: str or pyarrow.dataset.Dataset
+
+    :param columns: list of columns names to read
+    :type columns: list
+
+    :param index_name: name of the column to use as index. Defaults to pandas index stored in dataset metadata
+    :type index_name: str, optional
+
+    :param batch_size: maximal number of rows of each batch
+    :type batch_size: int, optional
+
+    :return: generator of pandas DataFrames of requested columns indexed by index column, in dataset order
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(source, format='parquet') if isinstance(source, (str, os.PathLike)) else source
+    index_name = index_name if index_name is not None else dataset_index_name(dataset)
+    read_columns = list(dict.fromkeys(columns + ([index_name] if index_name is not None else [])))
+    for batch in dataset.to_batches(columns=read_columns, batch_size=batch_size):
+        if batch.num_rows > 0:
+            yield _to_df(batch, index_name)
@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+
+from ds_toolbox.downsampling import downsample_positions, to_numeric, to_numeric_bound, window_positions
+from ds_toolbox.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+class ResamplingController:
+    """
+    Keeps full resolution data of a plotly FigureWidget server-side and, each time x axis range changes (zoom, pan,
+    reset), downsamples only the visible window to n_out points per key and pushes the result into the traces.
+    The browser only holds about n_out points per trace whatever the size of the data.
+
+    :param figure: plotly FigureWidget whose first traces are relative to keys
+    :type figure: plotly.graph_objects.FigureWidget
+
+    :param df: full resolution pandas DataFrame indexed by numbers or dates containing keys values
+    :type df: pandas DataFrame
+
+    :param keys: list of quantities names, the i-th key being plotted by the i-th trace of figure
+    :type keys: list
+
+    :param n_out: number of points per key to send for the visible window (about 2 per horizontal pixel)
+    :type n_out: int, optional
+
+    :param method: downsampling algorithm (see ds_toolbox.downsampling.DOWNSAMPLERS)
+    :type method: str or callable, optional
+
+    :param margin: fraction of window width added on both sides of the window, so that small pans stay smooth
+    :type margin: float, optional
+    """
+
+    def __init__(self, figure, df, keys, n_out=1000, method='minmax', margin=0.05):
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        self.figure = figure
+        self.keys = keys
+        self.n_out = n_out
+        self.method = method
+        self.margin = margin
+        self._x = df.index
+        self._x_numeric = to_numeric(df.index)
+        self._values = {key: df[key].to_numpy() for key in keys}
+        self._observe()
+
+    def _observe(self):
+        self.figure.layout.on_change(self._on_range_change, 'xaxis.range')
+        self.figure.layout.on_change(self._on_autorange_change, 'xaxis.autorange')
+
+    def window(self, x_range=None):
+        """
+        Gets positions of the first and last points to consider for an x range.
+
+        :param x_range: (min, max) couple of x values, None to get the whole data
+        :type x_range: tuple, optional
+
+        :return: tuple (start, end) of positions
+        """
+        if x_range is None or x_range[0] is None or x_range[1] is None:
+            return 0, len(self._x)
+        return window_positions(
+            self._x_numeric,
+            low=to_numeric_bound(self._x, x_range[0]),
+            high=to_numeric_bound(self._x, x_range[1]),
+            margin=self.margin
+        )
+
+    def resample(self, x_range=None):
+        """
+        Downsamples visible window and updates figure traces.
+
+        :param x_range: (min, max) couple of visible x values, None to display the whole data
+        :type x_range: tuple, optional
+        """
+        start, end = self.window(x_range)
+        positions = start + downsample_positions(
+            x=self._x[start:end],
+            ys=[self._values[key][start:end] for key in self.keys],
+            n_out=self.n_out,
+            method=self.method
+        )
+        logger.debug('Resampling %s points of [%s, %s] window to %s points', end - start, start, end, len(positions))
+        with self.figure.batch_update():
+            for ind, key in enumerate(self.keys):
+                self.figure.data[ind].x = self._x[positions]
+                self.figure.data[ind].y = self._values[key][positions]
+
+    def _on_range_change(self, layout, x_range):
+        self.resample(x_range)
+
+    def _on_autorange_change(self, layout, autorange):
+        if autorange is True:
+            self.resample()
+
+
+class PyramidResamplingController(ResamplingController):
+    """
+    Resampling of a plotly FigureWidget backed by a ds_toolbox.pyramid.Pyramid: each time x axis range changes, only
+    the pyramid buckets of the visible window are read, so zooming stays interactive whatever the length of the series.
+
+    :param figure: plotly FigureWidget whose first traces are relative to keys
+    :type figure: plotly.graph_objects.FigureWidget
+
+    :param pyramid: pyramid of the plotted series
+    :type pyramid: ds_toolbox.pyramid.Pyramid
+
+    :param keys: list of quantities names, the i-th key being plotted by the i-th trace of figure
+    :type keys: list
+
+    :param n_out: number of points per key to send for the visible window
+    :type n_out: int, optional
+
+    :param method: pyramid reduction (see ds_toolbox.pyramid.PYRAMID_REDUCTIONS)
+    :type method: str, optional
+    """
+
+    def __init__(self, figure, pyramid, keys, n_out=1000, method='minmax'):
+        self.figure = figure
+        self.pyramid = pyramid
+        self.keys = keys
+        self.n_out = n_out
+        self.method = method
+        self._observe()
+
+    def resample(self, x_range=None):
+        """
+        Queries the pyramid for the visible window and updates figure traces.
+
+        :param x_range: (min, max) couple of visible x values, None to display the whole data
+        :type x_range: tuple, optional
+        """
+        x_min, x_max = x_range if x_range is not None else (None, None)
+        series = self.pyramid.query_series(self.keys, x_min=x_min, x_max=x_max, n_out=self.n_out, method=self.method)
+        with self.figure.batch_update():
+            for ind, key in enumerate(self.keys):
+                self.figure.data[ind].x = series[key].index
+                self.figure.data[ind].y = series[key].to_numpy()
+
+
+class StreamingFigure:
+    """
+    Live time evolution FigureWidget fed with appended rows (ex: telemetry consumed from kafka). Last capacity rows
+    are kept in a fixed size ring buffer shared by all keys, so memory is constant whatever the stream duration.
+    Appended rows are coalesced and pushed to the browser at most once every refresh_interval seconds, in one
+    batch_update, optionally downsampled to n_out points per key. Rows appended less than refresh_interval seconds
+    after last push are pushed by a timer, so that the last rows of a paused stream are shown too.
+    plotly FigureWidget has no python API to extend traces, so each push sends the buffered window (bounded by
+    capacity or n_out), never the whole history.
+
+    :param keys: list of quantities names, appended DataFrames columns names
+    :type keys: list
+
+    :param capacity: number of rows kept in the ring buffer
+    :type capacity: int, optional
+
+    :param refresh_interval: minimal number of seconds between two pushes to the browser
+    :type refresh_interval: float, optional
+
+    :param n_out: number of points per key pushed to the browser. If None, all buffered rows are pushed
+    :type n_out: int, optional
+
+    :param method: downsampling algorithm used when n_out is set (see ds_toolbox.downsampling.DOWNSAMPLERS)
+    :type method: str or callable, optional
+
+    :param kwargs: optional arguments used in ds_toolbox.graphs.plot_evolution (names, colors, modes, webgl, title...)
+    """
+
+    def __init__(self, keys, capacity=10000, refresh_interval=0.2, n_out=None, method='minmax', **kwargs):
+        from ds_toolbox.graphs import plot, scatter_class
+
+        self.keys = keys
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.n_out = n_out
+        self.method = method
+        self._x = None
+        self._values = np.full((capacity, len(keys)), np.nan)
+        self._end = 0
+        self._size = 0
+        self._last_push = 0.
+        self._pending = False
+        self._timer = None
+        self._lock = threading.Lock()
+        self._push_lock = threading.Lock()
+
+        modes = kwargs.pop('modes', None)
+        names = kwargs.pop('names', None)
+        colors = kwargs.pop('colors', None)
+        webgl = kwargs.pop('webgl', 'auto')
+        webgl_threshold = kwargs.pop('webgl_threshold', None)
+        kwargs.pop('widget', None)
+        if 'x_axis_name' not in kwargs:
+            kwargs['x_axis_name'] = 'Time'
+        plotting_function = scatter_class(
+            webgl, n_points=(n_out or capacity) * len(keys), webgl_threshold=webgl_threshold
+        )
+        self.figure = plot(
+            traces=[
+                plotting_function(
+                    x=[],
+                    y=[],
+                    name=names[ind] if names is not None else key,
+                    mode=modes[ind] if modes is not None else 'lines',
+                    line={"color": colors[ind] if colors is not None else None}
+                )
+                for ind, key in enumerate(keys)
+            ],
+            widget=True,
+            **kwargs
+        )
+
+    def append(self, df):
+        """
+        Appends rows to the ring buffer and pushes them to the browser if last push is older than refresh_interval,
+        or schedules a push at the end of refresh_interval otherwise.
+
+        :param df: pandas DataFrame indexed by dates or numbers containing keys values, rows being more recent than
+        already appended ones
+        :type df: pandas DataFrame
+        """
+        if len(df) == 0:
+            return
+        df = df.iloc[-self.capacity:]
+        with self._lock:
+            if self._x is None:
+                self._x = np.empty(self.capacity, dtype=df.index.to_numpy().dtype)
+            positions = (self._end + np.arange(len(df))) % self.capacity
+            self._x[positions] = df.index.to_numpy()
+            self._values[positions] = df.reindex(columns=self.keys).to_numpy(dtype=float)
+            self._end = (self._end + len(df)) % self.capacity
+            self._size = min(self._size + len(df), self.capacity)
+            self._pending = True
+            delay = self.refresh_interval - (time.monotonic() - self._last_push)
+            if 0 < delay and self._timer is None:
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if delay <= 0:
+            self.flush()
+
+    def _buffer(self):
+        """
+        Gets buffered rows, _lock being held by the caller.
+        """
+        positions = (self._end - self._size + np.arange(self._size)) % self.capacity
+        x = self._x[positions] if self._x is not None else np.array([])
+        return pd.DataFrame(self._values[positions], index=x, columns=self.keys)
+
+    def buffer(self):
+        """
+        :return: pandas DataFrame of buffered rows, in chronological order
+        """
+        with self._lock:
+            return self._buffer()
+
+    def flush(self):
+        """
+        Pushes buffered rows to the browser if rows were appended since last push.
+        """
+        # Pushes are serialized, so that an older window is never pushed after a newer one
+        with self._push_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._pending:
+                    return
+                df = self._buffer()
+                self._pending = False
+                self._last_push = time.monotonic()
+            positions = downsample_positions(
+                x=df.index, ys=[df[key] for key in self.keys], n_out=self.n_out, method=self.method
+            )
+            x = df.index[positions]
+            with self.figure.batch_update():
+                for ind, key in enumerate(self.keys):
+                    self.figure.data[ind].x = x
+                    self.figure.data[ind].y = df[key].to_numpy()[positions]
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from ds_toolbox import graphs
+from ds_toolbox.cache import FigureCache, figure_key
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        rng.standard_normal((20000, 3)).cumsum(axis=0),
+        columns=['a', 'b', 'c'],
+        index=pd.date_range('2020-01-01', periods=20000, freq='s')
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FigureCache(str(tmp_path / 'cache'))
+
+
+def traces_data(fig):
+    """
+    Gets names, x and y values of traces, dates being compared as timestamps whatever their string format.
+    """
+    data = []
+    for trace in fig.data:
+        x = np.asarray(trace.x)
+        data.append((trace.name, pd.to_datetime(x).values if x.dtype.kind in 'UOM' else x, np.asarray(trace.y)))
+    return data
+
+
+def assert_same_traces(cached, built):
+    assert len(cached.data) == len(built.data)
+    for (cached_name, cached_x, cached_y), (name, x, y) in zip(traces_data(cached), traces_data(built)):
+        assert cached_name == name
+        np.testing.assert_array_equal(cached_x, x)
+        np.testing.assert_array_equal(cached_y, y)
+
+
+@pytest.mark.parametrize('options', [
+    dict(target_number_points=500, downsample='minmax'),
+    dict(target_number_points=500, x_min='2020-01-01 01:00', x_max='2020-01-01 02:00', clip_x=True),
+    dict(bandwith={'key': 'c', 'rolling': 100}, target_number_points=500, date_encoding='epoch'),
+])
+def test_plot_evolution_hit_equals_miss(df, cache, options):
+    missed = graphs.plot_evolution(['a', 'b'], df, show=False, cache=cache, **options)
+    hit = graphs.plot_evolution(['a', 'b'], df, show=False, cache=cache, **options)
+    uncached = graphs.plot_evolution(['a', 'b'], df, show=False, **options)
+    pd.testing.assert_frame_equal(hit, missed)
+    pd.testing.assert_frame_equal(hit, uncached)
+    assert len(cache.entries()) == 1
+
+    built = graphs.plot_evolution(['a', 'b'], df, show=False, return_figure=True, **options)
+    cached = graphs.plot_evolution(['a', 'b'], df, show=False, return_figure=True, cache=cache, **options)
+    assert_same_traces(cached, built)
+
+
+def test_plot_hist_hit_equals_miss(df, cache):
+    missed = graphs.plot_hist(['a'], df, show=False, cache=cache, target_number_points=1000)
+    hit = graphs.plot_hist(['a'], df, show=False, cache=cache, target_number_points=1000)
+    pd.testing.assert_frame_equal(hit, missed)
+    assert len(cache.entries()) == 1
+
+
+def test_cached_arrays_are_decoded(cache):
+    fig = go.Figure([
+        go.Scatter(x=np.arange(3), y=np.array([1., 2., 3.]), text=['a', 'b', 'c']),
+        go.Heatmap(z=np.arange(6.).reshape(2, 3), colorscale=[[0., 'red'], [1., 'blue']]),
+    ])
+    cache.put('key', fig)
+    cached = cache.get('key')
+    assert isinstance(cached.data[0].y, np.ndarray)
+    np.testing.assert_array_equal(cached.data[0].x, [0, 1, 2])
+    np.testing.assert_array_equal(cached.data[0].y, [1., 2., 3.])
+    np.testing.assert_array_equal(cached.data[0].text, ['a', 'b', 'c'])
+    np.testing.assert_array_equal(cached.data[1].z, np.arange(6.).reshape(2, 3))
+    assert [list(item) for item in cached.data[1].colorscale] == [[0., 'red'], [1., 'blue']]
+
+
+def test_key_depends_on_every_input(df):
+    options = dict(keys=['a'], title='A')
+    key = figure_key('plot_evolution', df, options)
+    changed_values = df.copy()
+    changed_values.iloc[123, 2] += 1.
+    changed_index = df.copy()
+    changed_index.index = changed_index.index + pd.Timedelta('1s')
+    keys = [
+        figure_key('plot_evolution', changed_values, options),
+        figure_key('plot_evolution', changed_index, options),
+        figure_key('plot_evolution', df.rename(columns={'c': 'd'}), options),
+        figure_key('plot_hist', df, options),
+        figure_key('plot_evolution', df, dict(options, title='B')),
+        figure_key('plot_evolution', df, dict(options, bandwith={'up_value': df['a'].to_numpy() + 1.})),
+    ]
+    assert key == figure_key('plot_evolution', df.copy(), dict(options))
+    assert len(set(keys + [key])) == len(keys) + 1
+
+
+def test_envelope_band_column_is_hashed(df, cache):
+    band = {'key': 'c', 'rolling': 100}
+    graphs.plot_evolution(['a'], df, show=False, cache=cache, bandwith=band)
+    changed = df.assign(c=df['c'] * 2.)
+    cached = graphs.plot_evolution(['a'], changed, show=False, cache=cache, bandwith=band, return_figure=True)
+    built = graphs.plot_evolution(['a'], changed, show=False, bandwith=band, return_figure=True)
+    assert len(cache.entries()) == 2
+    assert_same_traces(cached, built)
+
+
+def test_least_recently_used_figures_are_evicted(cache):
+    fig = go.Figure(go.Scatter(x=np.arange(100), y=np.arange(100.)))
+    for ind, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, fig)
+        os.utime(cache.path(key), (1000. + ind, 1000. + ind))
+    # Reading a marks it as the most recently used
+    assert cache.get('a') is not None
+    cache.max_bytes = 3 * os.path.getsize(cache.path('a'))
+    cache.put('d', fig)
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ['a', 'c', 'd'])
+    assert cache.size() <= cache.max_bytes
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ds_toolbox.chunked import _reduce_block, merge_aggregates, reduce_xarray
+from ds_toolbox.downsampling import bucket_aggregate
+
+xr = pytest.importorskip('xarray')
+pytest.importorskip('dask.array')
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    n = 10007
+    values = rng.standard_normal((n, 2)).cumsum(axis=0)
+    values[rng.integers(0, n, size=100), 0] = np.nan
+    values[5000, 1] = 1000.
+    return xr.Dataset(
+        {'a': ('time', values[:, 0]), 'b': ('time', values[:, 1])},
+        coords={'time': pd.date_range('2020-01-01', periods=n, freq='s')}
+    )
+
+
+@pytest.mark.parametrize('method', ['minmax', 'mean'])
+def test_dask_reduction_equals_eager_reduction(dataset, method):
+    # Chunks of 997 rows split most buckets of 51 rows over two chunks
+    eager = reduce_xarray(dataset, ['a', 'b'], n_out=400, method=method)
+    lazy = reduce_xarray(dataset.chunk({'time': 997}), ['a', 'b'], n_out=400, method=method)
+    pd.testing.assert_frame_equal(lazy, eager)
+
+
+def test_minmax_reduction_keeps_extremes(dataset):
+    reduced = reduce_xarray(dataset.chunk({'time': 997}), ['a', 'b'], n_out=400)
+    assert reduced['a'].max() == np.nanmax(dataset['a'].values)
+    assert reduced['a'].min() == np.nanmin(dataset['a'].values)
+    assert reduced.loc[dataset['time'].values[5000], 'b'] == 1000.
+
+
+def test_merge_aggregates_equals_single_block():
+    values = np.random.default_rng(1).standard_normal((1000, 3))
+    bucket_size = 30
+    n_buckets = int(np.ceil(len(values) / bucket_size))
+    offsets = [0, 17, 350, 351, 700]
+    blocks = [
+        _reduce_block(values[start:end], start, bucket_size)
+        for start, end in zip(offsets, offsets[1:] + [len(values)])
+    ]
+    merged = merge_aggregates(blocks, n_buckets)
+    direct = bucket_aggregate(values, np.arange(len(values)) // bucket_size)
+    for name in ['count', 'sum', 'min', 'max', 'argmin', 'argmax']:
+        np.testing.assert_allclose(merged[name], direct[name])
+
+
+def test_unknown_reduction_raises(dataset):
+    with pytest.raises(ValueError, match='Unknown xarray reduction'):
+        reduce_xarray(dataset, ['a'], method='median')
+
+
+def test_minmax_reduction_returns_real_rows(dataset):
+    reduced = reduce_xarray(dataset.chunk({'time': 997}), ['a', 'b'], n_out=400)
+    rows = dataset.to_dataframe().loc[reduced.index, ['a', 'b']]
+    pd.testing.assert_frame_equal(reduced, rows, check_names=False, check_freq=False)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ds_toolbox.downsampling import downsample_positions, lttb, m4, min_max, stride
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    y = rng.standard_normal(10000).cumsum()
+    y[1234] = 1000.
+    y[8765] = -1000.
+    return np.arange(len(y), dtype=float), y
+
+
+@pytest.mark.parametrize('function', [min_max, m4, lttb])
+def test_spikes_are_preserved(series, function):
+    x, y = series
+    positions = function(x, y, 200)
+    assert 1234 in positions
+    assert 8765 in positions
+    assert len(positions) <= 200
+
+
+@pytest.mark.parametrize('function', [stride, min_max, m4, lttb])
+def test_positions_are_sorted_and_unique(series, function):
+    x, y = series
+    positions = function(x, y, 200)
+    assert np.all(np.diff(positions) > 0)
+    assert positions[0] >= 0
+    assert positions[-1] < len(y)
+
+
+@pytest.mark.parametrize('function', [m4, lttb])
+def test_first_and_last_points_are_kept(series, function):
+    x, y = series
+    positions = function(x, y, 200)
+    assert positions[0] == 0
+    assert positions[-1] == len(y) - 1
+
+
+def test_min_max_keeps_bucket_extremes(series):
+    x, y = series
+    positions = min_max(x, y, 200)
+    buckets = y.reshape(100, 100)
+    assert set(y[positions]) == set(buckets.min(axis=1)) | set(buckets.max(axis=1))
+
+
+def test_stride_keeps_n_out_points(series):
+    x, y = series
+    assert len(stride(x, y, 200)) == 200
+
+
+def test_downsample_positions_shares_positions_between_series(series):
+    x, y = series
+    positions = downsample_positions(x, [y, -y], 200, method='minmax')
+    assert np.array_equal(positions, np.union1d(min_max(x, y, 200), min_max(x, -y, 200)))
+
+
+def test_downsample_positions_keeps_small_series():
+    x = np.arange(10, dtype=float)
+    assert np.array_equal(downsample_positions(x, [x], 100, method='lttb'), np.arange(10))
+
+
+def test_unknown_method_raises(series):
+    x, y = series
+    with pytest.raises(ValueError, match='Unknown downsampling method'):
+        downsample_positions(x, [y], 200, method='unknown')
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from ds_toolbox import export
+
+
+class RecordingRenderer:
+    """
+    Renderer recording in a file that it was closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    async def close(self):
+        with open(self.path, 'w') as closed_file:
+            closed_file.write('closed')
+
+
+def open_renderer(prefix, **kwargs):
+    """
+    Plot spec function opening a recording renderer in the process building the figure.
+    """
+    export._renderer.update(kaleido=RecordingRenderer(prefix + str(os.getpid())), loop=asyncio.new_event_loop())
+    return go.Figure(go.Scatter(y=[1, 2]))
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_html_export_ignores_image_options(tmp_path, n_workers):
+    paths = [str(tmp_path / 'figure_{}.html'.format(ind)) for ind in range(2)]
+    figures = [
+        go.Figure(go.Scatter(y=[1, 2])),
+        {'function': 'plot_xy', 'args': [pd.DataFrame({'a': [1., 2., 3.]}), 'a', ['a']]}
+    ]
+    reports = export.export_figures(figures, paths, n_workers=n_workers, width=800, height=600,
+                                    include_plotlyjs='cdn')
+    assert [report['error'] for report in reports] == [None, None]
+    for path in paths:
+        with open(path) as html_file:
+            assert 'cdn.plot.ly' in html_file.read()
+
+
+def test_failures_are_reported(tmp_path):
+    reports = export.export_figures([go.Figure()], [str(tmp_path / 'figure.txt')], n_workers=1)
+    assert "Unknown export format 'txt'" in reports[0]['error']
+
+
+def test_worker_renderers_are_closed(tmp_path):
+    prefix = str(tmp_path / 'closed_')
+    specs = [{'function': open_renderer, 'args': [prefix]} for _ in range(4)]
+    paths = [str(tmp_path / 'figure_{}.html'.format(ind)) for ind in range(4)]
+    reports = export.export_figures(specs, paths, n_workers=2)
+    assert [report['error'] for report in reports] == [None] * 4
+    pids = {report['pid'] for report in reports}
+    assert os.getpid() not in pids
+    assert all(os.path.exists(prefix + str(pid)) for pid in pids)
@@ -0,0 +1,5 @@
+from benchmarks.import_budget import check_import_budgets
+
+
+def test_import_budgets():
+    assert check_import_budgets() == []
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ds_toolbox import graphs
+from ds_toolbox.pyramid import _STATISTICS, _aggregate_rows, _merge_level, build_pyramid
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 300001
+    values = rng.standard_normal((n, 2)).cumsum(axis=0)
+    values[rng.integers(0, n, size=1000), 1] = np.nan
+    values[123457, 0] = 1e4
+    values[200003, 1] = -1e4
+    return pd.DataFrame(values, columns=['a', 'b'], index=np.arange(n) * 0.5)
+
+
+@pytest.fixture
+def pyramid(df, tmp_path):
+    return build_pyramid(df, ['a', 'b'], path=str(tmp_path / 'pyramid'), base=16, factor=4)
+
+
+def test_merged_level_equals_direct_aggregation(df):
+    level = _aggregate_rows(df, ['a', 'b'], 0, 16)
+    merged = _merge_level(level, 4)
+    direct = _aggregate_rows(df, ['a', 'b'], 0, 64)
+    for name in _STATISTICS:
+        if name == 'sum':
+            # Sums only differ by summation order
+            np.testing.assert_allclose(merged[name], direct[name], rtol=1e-12, err_msg=name)
+        else:
+            np.testing.assert_array_equal(merged[name], direct[name], err_msg=name)
+
+
+def test_query_extremes_equal_direct_extremes(df, pyramid):
+    reduced = pyramid.query(n_out=1000)
+    assert len(reduced) <= 2 * 1000
+    for key in ['a', 'b']:
+        assert reduced[key].max() == df[key].max()
+        assert reduced[key].min() == df[key].min()
+
+
+def test_window_extremes_equal_direct_extremes(df, pyramid):
+    x_min, x_max = 50000., 110000.
+    rows = df[(df.index >= x_min) & (df.index <= x_max)]
+    spike = rows.index[len(rows) // 3]
+    df_spike = df['a'].copy()
+    df_spike[spike] = 1e5
+    pyramid_spike = build_pyramid(df_spike.to_frame(), ['a'], path=pyramid.path + '_spike', base=16, factor=4)
+
+    reduced = pyramid_spike.query(x_min=x_min, x_max=x_max, n_out=1000)
+    assert reduced['a'].max() == 1e5
+    assert reduced['a'].idxmax() == spike
+    # Extra buckets are only read on each side of the window
+    assert reduced.index.min() >= x_min - 2 * 16 * 0.5 * 4
+    assert reduced.index.max() <= x_max + 2 * 16 * 0.5 * 4
+
+
+def test_spikes_are_at_their_true_x(df, pyramid):
+    reduced = pyramid.query(n_out=500)
+    assert reduced['a'].idxmax() == df.index[123457]
+    assert reduced['b'].idxmin() == df.index[200003]
+
+
+def test_points_are_real_rows(df, pyramid):
+    reduced = pyramid.query(n_out=500)
+    series = pyramid.query_series(n_out=500)
+    for key in ['a', 'b']:
+        points = reduced[key].dropna()
+        np.testing.assert_array_equal(points.to_numpy(), df.loc[points.index, key].to_numpy())
+        np.testing.assert_array_equal(series[key].index, reduced.index[reduced.index.isin(series[key].index)])
+        assert series[key].index.is_monotonic_increasing
+        assert not series[key].index.has_duplicates
+
+
+def test_resampling_widget_sends_query_points(df, pyramid):
+    pytest.importorskip('ipywidgets')
+    fig = graphs.plot_evolution(['a', 'b'], pyramid, show=False, widget='resample', target_number_points=500)
+    series = pyramid.query_series(['a', 'b'], n_out=500)
+    assert [len(trace.x) for trace in fig.data] == [len(series['a']), len(series['b'])]
+    fig.layout.xaxis.autorange = True
+    assert [len(trace.x) for trace in fig.data] == [len(series['a']), len(series['b'])]
+    for trace in fig.data:
+        np.testing.assert_array_equal(trace.y, df.loc[np.asarray(trace.x), trace.name].to_numpy())
+
+
+def test_mean_query_equals_bucket_means(df, tmp_path):
+    small = df.iloc[:16 * 100]
+    pyramid = build_pyramid(small, ['a'], path=str(tmp_path / 'small'), base=16, factor=4)
+    reduced = pyramid.query(keys=['a'], n_out=100, method='mean')
+    np.testing.assert_allclose(reduced['a'].values, small['a'].values.reshape(100, 16).mean(axis=1))
+
+
+def test_dates_are_restored(tmp_path):
+    df = pd.DataFrame({'a': np.arange(4096.)}, index=pd.date_range('2020-01-01', periods=4096, freq='s'))
+    pyramid = build_pyramid(df, ['a'], path=str(tmp_path / 'dates'), base=16, factor=4)
+    reduced = pyramid.query(n_out=100)
+    assert isinstance(reduced.index, pd.DatetimeIndex)
+    assert reduced['a'].idxmax() == df.index[-1]
+    assert reduced['a'].idxmin() == df.index[0]
+
+
+def test_unknown_reduction_raises(pyramid):
+    with pytest.raises(ValueError, match='Unknown pyramid reduction'):
+        pyramid.query(method='median')
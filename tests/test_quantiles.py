@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from ds_toolbox.quantiles import KLLSketch, exact_quantiles
+
+QUANTILES = np.linspace(0., 1., 21)
+
+
+def rank_errors(values, estimates, quantiles):
+    """
+    Gets the distance between the normalized rank of each estimate in values and its requested quantile.
+    """
+    values = np.sort(values)
+    ranks = (np.searchsorted(values, estimates, side='left') + np.searchsorted(values, estimates, side='right')) / 2.
+    return np.abs(ranks / len(values) - quantiles)
+
+
+def test_exact_quantiles_ignore_nan():
+    values = np.array([1., np.nan, 2., 3., np.nan])
+    assert np.array_equal(exact_quantiles(values, [0., 0.5, 1.]), [1., 2., 3.])
+    assert len(exact_quantiles([np.nan], [0.5])) == 0
+
+
+@pytest.mark.parametrize('k', [100, 200])
+def test_sketch_rank_error_is_bounded(k):
+    values = np.random.default_rng(0).lognormal(size=200000)
+    sketch = KLLSketch(k=k, seed=0)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    assert rank_errors(values, sketch.quantiles(QUANTILES), QUANTILES).max() < 3. / k
+
+
+def test_merged_sketch_rank_error_is_bounded():
+    rng = np.random.default_rng(1)
+    parts = [rng.normal(loc, 1., size=50000) for loc in range(4)]
+    sketches = [KLLSketch(k=200, seed=ind).update(part) for ind, part in enumerate(parts)]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+
+    values = np.concatenate(parts)
+    assert merged.count == len(values)
+    assert rank_errors(values, merged.quantiles(QUANTILES), QUANTILES).max() < 3. / 200
+    extremes = merged.quantiles([0., 1.])
+    assert np.array_equal(extremes, exact_quantiles(values, [0., 1.]))
+
+
+def test_sketch_keeps_small_inputs_exact():
+    values = np.arange(100, dtype=float)
+    sketch = KLLSketch(k=200).update(values)
+    assert np.array_equal(sketch.quantiles([0., 0.5, 1.]), [0., 49., 99.])
+    assert len(KLLSketch().quantiles([0.5])) == 0